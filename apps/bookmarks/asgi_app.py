@@ -0,0 +1,289 @@
+"""
+ASGI entry point for the bookmarks service (same endpoints as the Flask app).
+
+Run with BOOKMARKS_SERVER=uvicorn python3 secure_slack_bookmarks.py, or
+directly: uvicorn asgi_app:app --workers 4 --port 5000
+
+Each worker process keeps one httpx.AsyncClient (keep-alive connection pool)
+and BOOKMARKS_DELIVERY_CONCURRENCY drain tasks, so queued bookmarks wait on
+the webhook concurrently. The SQLite queue is shared by all workers; claims
+are leased, so two processes never deliver the same item at once.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+
+import startup
+
+startup.load_env()
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import delivery
+import extract
+import logsetup
+import metrics
+import pages
+import service
+import sinks
+
+logsetup.setup_logging()
+log = logging.getLogger(__name__)
+
+_wakeup = asyncio.Event()
+_client = None
+_sink_slots = asyncio.Semaphore(service.SINK_CONCURRENCY)
+
+
+def _first_values(multi):
+    """Flatten a Starlette multi-dict keeping the first value (as Flask does)."""
+    flat = {}
+    for k, v in multi.multi_items():
+        if isinstance(v, str):
+            flat.setdefault(k, v)
+    return flat
+
+
+async def _get_input(request):
+    """Async twin of secure_slack_bookmarks._get_input."""
+    raw_body = (await request.body()).decode("utf-8", "replace")
+    json_data = extract.parse_json_body(raw_body)
+    form = _first_values(await request.form()) if raw_body else None
+    args = _first_values(request.query_params)
+    data = extract.merge_sources(json_data, form, args)
+    url, note, emoji, token = extract.extract_fields(data, raw_body)
+
+    level = logsetup.dump_level(log)
+    if level is not None:
+        log.log(
+            level,
+            "Request dump: content_type=%s body_bytes=%d json=%s form=%s args=%s merged=%s "
+            "-> url=%r note=%r token=%s",
+            request.headers.get("content-type"), len(raw_body), json_data is not None,
+            list(form or ()), list(args), extract.redacted(data),
+            url, note, "***" if token else None,
+        )
+    return url, note, emoji, token
+
+
+def _json(body, status):
+    headers = {"Retry-After": str(body["retry_after"])} if status == 429 else None
+    return JSONResponse(body, status_code=status, headers=headers)
+
+
+class _BodyLimit:
+    """ASGI middleware: 413 on an oversized Content-Length before the body is
+    read; otherwise count body bytes as they arrive and raise
+    service.BodyTooLarge past the limit (chunked uploads)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = service.body_limit(scope["path"]) if scope["type"] == "http" else 0
+        if limit <= 0:
+            return await self.app(scope, receive, send)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length and length.isdigit() and int(length) > limit:
+            return await _json(*service.body_too_large(limit))(scope, receive, send)
+        seen = 0
+
+        async def capped_receive():
+            nonlocal seen
+            message = await receive()
+            if message["type"] == "http.request":
+                seen += len(message.get("body", b""))
+                if seen > limit:
+                    raise service.BodyTooLarge(limit)
+            return message
+
+        await self.app(scope, capped_receive, send)
+
+
+async def _body_too_large(request, exc):
+    return _json(*service.body_too_large(exc.limit))
+
+
+class _RequestMetrics:
+    """ASGI middleware: request counts, latency and in-flight gauge."""
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        endpoint = scope["path"] if scope["path"] in self.paths else "other"
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.IN_FLIGHT.dec()
+            metrics.REQUESTS.inc(endpoint, status)
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+
+
+async def index(request):
+    status, body, headers = pages.INDEX_PAGE.respond(
+        request.headers.get("accept-encoding", ""),
+        request.headers.get("if-none-match", ""),
+    )
+    return Response(body, status_code=status, headers=headers)
+
+
+async def bookmark(request):
+    limited = service.check_client_rate(
+        request.client.host if request.client else None, request.headers.get,
+    )
+    if limited:
+        return _json(*limited)
+    token, refused = service.check_header_token(request.headers.get)
+    if refused:
+        return _json(*refused)
+    with metrics.STAGE_SECONDS.time("input"):
+        url, note, emoji, body_token = await _get_input(request)
+    # enqueue is a short SQLite write; keep it off the event loop anyway
+    body, status = await asyncio.to_thread(
+        service.accept_bookmark, url, note, emoji, body_token if token is None else token,
+    )
+    if status == 202:
+        _wakeup.set()
+    return _json(body, status)
+
+
+async def bookmarks_bulk(request):
+    limited = service.check_client_rate(
+        request.client.host if request.client else None, request.headers.get,
+    )
+    if limited:
+        return _json(*limited)
+    token, refused = service.check_header_token(request.headers.get)
+    if refused:
+        return _json(*refused)
+    args = request.query_params
+    chunks = request.stream()
+    first = b""
+    async for first in chunks:
+        if first:
+            break
+    importer, refused = await asyncio.to_thread(
+        service.begin_bulk_import,
+        args.get("token") if token is None else token, args.get("format"),
+        request.headers.get("content-type"), first,
+    )
+    if refused:
+        return _json(*refused)
+    async for chunk in chunks:
+        if chunk:
+            # parsing and the occasional batch enqueue stay off the event loop
+            await asyncio.to_thread(importer.feed, chunk)
+    body, status = await asyncio.to_thread(service.finish_bulk_import, importer)
+    if body.get("messages"):
+        _wakeup.set()
+    return _json(body, status)
+
+
+async def search(request):
+    args = request.query_params
+    token = service.header_token(request.headers.get)
+    body, status = await asyncio.to_thread(
+        service.search_bookmarks,
+        args.get("q"), args.get("limit"), args.get("offset"),
+        args.get("token") if token is None else token, args.get("after"),
+    )
+    return _json(body, status)
+
+
+async def queue_status(request):
+    return JSONResponse(await asyncio.to_thread(service.queue_status))
+
+
+async def health(request):
+    return JSONResponse(service.health())
+
+
+async def metrics_endpoint(request):
+    # The queue gauges read SQLite; render off the event loop.
+    body = await asyncio.to_thread(metrics.render)
+    return Response(body, headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+def _http_client():
+    """This worker's pooled AsyncClient, created (and httpx imported) on first use."""
+    global _client
+    if _client is None:
+        import httpx
+        limits = httpx.Limits(
+            max_connections=service.SINK_CONCURRENCY,
+            max_keepalive_connections=service.SINK_CONCURRENCY,
+        )
+        _client = httpx.AsyncClient(timeout=sinks.WEBHOOK_TIMEOUT, limits=limits)
+    return _client
+
+
+async def _send(sink, item):
+    async with _sink_slots:
+        with service.sink_call(sink.name):
+            await sink.asend(item, _http_client() if isinstance(sink, sinks.HttpSink) else None)
+
+
+async def _deliver(item):
+    """Async twin of service.deliver: all pending sinks at once."""
+    pending, held = service.pending_sinks(item)
+    with metrics.STAGE_SECONDS.time("webhook"):
+        outcomes = await asyncio.gather(
+            *(_send(sink, item) for sink in pending), return_exceptions=True,
+        )
+    failed, closed = service.record_results(item, list(zip(pending, outcomes)))
+    if closed:
+        await asyncio.to_thread(service.QUEUE.retry_now)
+    service.check_delivered(failed, held)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    workers = [
+        asyncio.create_task(delivery.run_async_worker(
+            service.QUEUE, _deliver, _wakeup, log,
+        ))
+        for _ in range(service.DELIVERY_CONCURRENCY)
+    ]
+    try:
+        yield
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if _client is not None:
+            await _client.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/", index),
+        Route("/bookmark", bookmark, methods=["POST"]),
+        Route("/bookmarks/bulk", bookmarks_bulk, methods=["POST"]),
+        Route("/search", search),
+        Route("/queue", queue_status),
+        Route("/health", health),
+        Route("/metrics", metrics_endpoint),
+    ],
+    lifespan=lifespan,
+    exception_handlers={service.BodyTooLarge: _body_too_large},
+)
+
+app.add_middleware(_BodyLimit)
+app.add_middleware(_RequestMetrics, paths=[route.path for route in app.routes])
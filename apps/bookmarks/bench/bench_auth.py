@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Latency of rejecting a bad token: header fast path vs token in the body.
+
+POSTs the same bookmark (JSON with a --note-kb note) through the Flask test
+client with a wrong token in the body, in X-Bookmarks-Token and in
+Authorization: Bearer, and reports µs per 401: round trip through the test
+client, and time inside the app (bookmarks_request_seconds). The header
+paths answer before the body is read; the body path parses it first.
+
+Usage:
+    python3 bench/bench_auth.py [--number 2000] [--repeat 5] [--note-kb 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+scratch = tempfile.mkdtemp(prefix="bench-auth-")
+os.environ.update(
+    BOOKMARKS_QUEUE_PATH=os.path.join(scratch, "queue.db"),
+    BOOKMARKS_STORE_PATH=os.path.join(scratch, "bookmarks.db"),
+    BOOKMARKS_LOG_LEVEL="WARNING",
+    BOOKMARKS_RATE_PER_MINUTE="0",
+    BOOKMARKS_SECRET_TOKEN="s3cret-token-for-bench",
+    MATTERMOST_WEBHOOK_URL="http://127.0.0.1:9/",
+)
+
+import metrics  # noqa: E402
+import secure_slack_bookmarks as svc  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="requests per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is reported)")
+    parser.add_argument("--note-kb", type=int, default=4, help="size of the note in the body")
+    opts = parser.parse_args()
+
+    client = svc.app.test_client()
+    note = "n" * (opts.note_kb * 1024)
+    bad = "wrong-token-wrong-token"
+    body_bad = json.dumps({"url": "https://example.com/a", "note": note, "token": bad})
+    body = json.dumps({"url": "https://example.com/a", "note": note})
+    cases = [
+        ("token in body", body_bad, {}),
+        ("X-Bookmarks-Token", body, {"X-Bookmarks-Token": bad}),
+        ("Authorization: Bearer", body, {"Authorization": f"Bearer {bad}"}),
+    ]
+    for _, data, headers in cases:
+        resp = client.post("/bookmark", data=data, headers=headers, content_type="application/json")
+        assert resp.status_code == 401, resp.status_code
+
+    best = {name: float("inf") for name, _, _ in cases}
+    best_app = dict(best)
+    for _ in range(opts.repeat):  # interleave so drift hits every case equally
+        for name, data, headers in cases:
+            count0, sum0 = metrics.REQUEST_SECONDS.totals("/bookmark")
+            t = timeit.timeit(
+                lambda: client.post("/bookmark", data=data, headers=headers,
+                                    content_type="application/json"),
+                number=opts.number,
+            )
+            count1, sum1 = metrics.REQUEST_SECONDS.totals("/bookmark")
+            best[name] = min(best[name], t / opts.number * 1e6)
+            best_app[name] = min(best_app[name], (sum1 - sum0) / (count1 - count0) * 1e6)
+    base_app = best_app["token in body"]
+    print(f"{'':<24} {'round trip':>12} {'in app':>18}")
+    for name, _, _ in cases:
+        print(f"{name:<24} {best[name]:>9.1f} µs {best_app[name]:>9.1f} µs ({base_app / best_app[name]:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
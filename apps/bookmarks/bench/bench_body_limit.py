@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Peak server RSS while POST /bookmark receives a stream of oversized bodies.
+
+Starts the app in a subprocess on a scratch queue/archive, sends --count
+bodies of --size MB each (half with Content-Length, half chunked; the client
+generates them on the fly) and reports the statuses plus the server's peak
+RSS (VmHWM) before and after. Runs once with the default BOOKMARKS_MAX_BODY
+and once with the limit off (0) for comparison. Linux only (/proc).
+
+With the limit, peak RSS should stay flat however many bodies are sent.
+Flask's development server drains an unread body in 10 MB reads after
+answering, so expect a one-time step of about 20 MB there; uvicorn does not.
+
+Usage:
+    python3 bench/bench_body_limit.py [--count 6] [--size 100] [--server flask|uvicorn]
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CHUNK = b'{"url": "https://example.com/a", "note": "' + b"x" * (64 * 1024 - 40)
+
+
+def _rss_kb(pid, field):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _body(size):
+    sent = 0
+    while sent < size:
+        piece = CHUNK[: size - sent]
+        sent += len(piece)
+        yield piece
+
+
+def _post(port, size, chunked):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        if chunked:
+            conn.request("POST", "/bookmark", body=_body(size), encode_chunked=True,
+                         headers={"Content-Type": "application/json"})
+        else:
+            conn.putrequest("POST", "/bookmark")
+            conn.putheader("Content-Type", "application/json")
+            conn.putheader("Content-Length", str(size))
+            conn.endheaders()
+            for piece in _body(size):
+                conn.send(piece)
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # server answered early and closed; the response may still be readable
+    try:
+        return conn.getresponse().status
+    except (http.client.HTTPException, OSError) as e:
+        return type(e).__name__
+    finally:
+        conn.close()
+
+
+def _wait_ready(port, proc):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit("server exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit("server did not start")
+
+
+def run(opts, max_body):
+    scratch = tempfile.mkdtemp(prefix="bench-body-")
+    port = opts.port
+    env = dict(
+        os.environ,
+        BOOKMARKS_QUEUE_PATH=os.path.join(scratch, "queue.db"),
+        BOOKMARKS_STORE_PATH=os.path.join(scratch, "bookmarks.db"),
+        BOOKMARKS_LOG_LEVEL="WARNING",
+        BOOKMARKS_RATE_PER_MINUTE="0",
+        BOOKMARKS_SERVER=opts.server,
+        BOOKMARKS_HOST="127.0.0.1",
+        BOOKMARKS_PORT=str(port),
+        MATTERMOST_WEBHOOK_URL="http://127.0.0.1:9/",
+    )
+    if max_body is not None:
+        env["BOOKMARKS_MAX_BODY"] = str(max_body)
+    proc = subprocess.Popen([sys.executable, "secure_slack_bookmarks.py"], cwd=APP_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port, proc)
+        _post(port, 1024, False)  # warm up the request path before the baseline
+        before = _rss_kb(proc.pid, "VmHWM")
+        statuses = {}
+        started = time.perf_counter()
+        for i in range(opts.count):
+            key = ("chunked" if i % 2 else "content-length", _post(port, opts.size << 20, i % 2 == 1))
+            statuses[key] = statuses.get(key, 0) + 1
+        elapsed = time.perf_counter() - started
+        after = _rss_kb(proc.pid, "VmHWM")
+    finally:
+        proc.terminate()
+        proc.wait()
+    label = "limit off" if max_body == 0 else f"limit {max_body or 'default'}"
+    print(f"{label:<14} peak RSS {before / 1024:7.1f} MB -> {after / 1024:7.1f} MB  "
+          f"({elapsed:5.1f}s)  " + ", ".join(f"{m}: {s} x{n}" for (m, s), n in sorted(statuses.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=6, help="bodies to send per run")
+    parser.add_argument("--size", type=int, default=100, help="body size in MB")
+    parser.add_argument("--server", choices=("flask", "uvicorn"), default="flask")
+    parser.add_argument("--port", type=int, default=5099)
+    opts = parser.parse_args()
+    run(opts, None)
+    run(opts, 0)
+
+
+if __name__ == "__main__":
+    main()
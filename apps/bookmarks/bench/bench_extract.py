@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark /bookmark input extraction across every accepted request shape.
+
+Compares the single-pass extractor (extract.py) with the previous multi-scan
+implementation (kept below as legacy_extract), checks that both return the
+same (url, note, emoji, token) for every shape, and reports the best-of-N
+µs per request. Exits non-zero on any mismatch.
+
+Usage:
+    python3 bench/bench_extract.py [--number 20000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import extract  # noqa: E402
+
+# name -> (raw body, form-encoded?, query string)
+SHAPES = {
+    "json": ('{"url": "https://example.com/article?id=1", "note": "read later", "token": "s3cret"}', False, ""),
+    "json_shortcut_input": ('{"Shortcut Input": "https://example.com/a", "Token": "s3cret", "Emoji": "📚"}', False, ""),
+    "json_mixed_case": ('{"uRl": "https://example.com/b", "TOKEN": "s3cret"}', False, ""),
+    "json_value_only": ('{"whatever": "https://example.com/c", "token": "s3cret"}', False, ""),
+    "form": ("url=https%3A%2F%2Fexample.com%2Fd&note=hello&token=s3cret", True, ""),
+    "query": ("", False, "url=https%3A%2F%2Fexample.com%2Fe&token=s3cret"),
+    "ios_url_as_key": ("https%3A%2F%2Fexample.com%2Ff%3Fq%3D1=&token=s3cret", True, ""),
+    "raw_text": ("https://example.com/g", False, "token=s3cret"),
+    "raw_text_sentence": ("look at this https://example.com/h please", False, "token=s3cret"),
+    "whitespace_url_key": ('{"url": "  ", "link": "https://example.com/i"}', False, ""),
+    "empty": ("", False, ""),
+}
+
+
+def _sources(raw_body, is_form, query):
+    form = dict(parse_qsl(raw_body, keep_blank_values=True)) if is_form else {}
+    args = dict(parse_qsl(query, keep_blank_values=True))
+    return raw_body, form, args
+
+
+def legacy_extract(raw_body, form, args):
+    """The pre-extract.py _get_input logic, minus Flask and debug output."""
+    json_data = None
+    try:  # request.get_json(force=True, silent=True)
+        json_data = json.loads(raw_body)
+    except Exception:
+        pass
+    if not isinstance(json_data, dict):
+        json_data = None
+    if json_data is None and raw_body and raw_body.strip().startswith("{"):
+        try:
+            json_data = json.loads(raw_body)
+            if not isinstance(json_data, dict):
+                json_data = None
+        except Exception:
+            pass
+
+    data = {}
+    if json_data:
+        data.update(json_data)
+    if form:
+        data.update(form)
+    if args:
+        data.update(args)
+
+    url = None
+    for key in ("url", "URL", "Url", "link", "Link", "LINK",
+                "bookmark_url", "Bookmark URL", "text", "Text",
+                "content", "Content", "input", "Input", "Shortcut Input"):
+        if key in data and data[key] not in (None, ""):
+            url = str(data[key]).strip()
+            break
+    if not url:
+        for k, v in data.items():
+            if isinstance(k, str) and k.lower() in ("url", "link", "text", "content", "input"):
+                if v not in (None, ""):
+                    url = str(v).strip()
+                    break
+    if not url:
+        for v in data.values():
+            if isinstance(v, str) and extract.is_valid_url(v):
+                url = v.strip()
+                break
+    if not url:
+        for k in data.keys():
+            if isinstance(k, str) and extract.is_valid_url(k):
+                url = k.strip()
+                break
+    if not url and raw_body:
+        stripped = raw_body.strip()
+        if extract.is_valid_url(stripped):
+            url = stripped
+        elif "\n" not in stripped and "://" in stripped:
+            for part in stripped.split():
+                if extract.is_valid_url(part):
+                    url = part
+                    break
+
+    note = ""
+    emoji = "🔗"
+    token = None
+    for key in ("note", "Note", "description", "Description"):
+        if key in data and data[key] not in (None, ""):
+            note = str(data[key])
+            break
+    for key in ("emoji", "Emoji"):
+        if key in data and data[key] not in (None, ""):
+            emoji = str(data[key])
+            break
+    for key in ("token", "Token", "TOKEN"):
+        if key in data and data[key] not in (None, ""):
+            token = str(data[key])
+            break
+    return url, note, emoji, token
+
+
+def current_extract(raw_body, form, args):
+    data = extract.merge_sources(extract.parse_json_body(raw_body), form, args)
+    return extract.extract_fields(data, raw_body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="iterations per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per shape (best is reported)")
+    opts = parser.parse_args()
+
+    mismatches = 0
+    print(f"{'shape':<22} {'legacy µs':>10} {'current µs':>11} {'speedup':>8}")
+    for name, shape in SHAPES.items():
+        raw_body, form, args = _sources(*shape)
+        expected = legacy_extract(raw_body, form, args)
+        got = current_extract(raw_body, form, args)
+        if got != expected:
+            mismatches += 1
+            print(f"MISMATCH {name}: legacy={expected!r} current={got!r}")
+        t_old = min(timeit.repeat(lambda: legacy_extract(raw_body, form, args),
+                                  number=opts.number, repeat=opts.repeat))
+        t_new = min(timeit.repeat(lambda: current_extract(raw_body, form, args),
+                                  number=opts.number, repeat=opts.repeat))
+        us_old = t_old / opts.number * 1e6
+        us_new = t_new / opts.number * 1e6
+        print(f"{name:<22} {us_old:>10.2f} {us_new:>11.2f} {us_old / us_new:>7.2f}x")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for GET / : Jinja render per request vs the prebuilt page.
+
+Times, in µs per request:
+  render        render_template_string(INDEX_HTML) (the old index() body)
+  prebuilt      INDEX_PAGE.respond() for identity / gzip / br / a 304 revalidation
+  GET / ...     the same cases through the Flask test client (full stack)
+
+Usage:
+    python3 bench/bench_index.py [--number 2000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("BOOKMARKS_QUEUE_PATH", os.path.join(tempfile.gettempdir(), "bench-bookmarks-queue.db"))
+os.environ.setdefault("BOOKMARKS_LOG_LEVEL", "WARNING")
+
+from flask import render_template_string  # noqa: E402
+
+import pages  # noqa: E402
+import secure_slack_bookmarks as svc  # noqa: E402
+
+
+def _time(fn, opts):
+    best = min(timeit.repeat(fn, number=opts.number, repeat=opts.repeat))
+    return best / opts.number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="iterations per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is reported)")
+    opts = parser.parse_args()
+
+    app, page = svc.app, pages.INDEX_PAGE
+    with app.app_context():
+        rendered = render_template_string(pages.INDEX_HTML)
+    # Jinja drops the template's final newline; otherwise the bytes must match
+    if rendered.encode("utf-8") != page.variants["identity"][0].rstrip(b"\n"):
+        sys.exit("prebuilt page differs from the rendered template")
+    gz_etag = page.variants["gzip"][1]
+
+    for name, (body, etag) in page.variants.items():
+        print(f"variant {name:<8} {len(body):>6} bytes  ETag {etag}")
+    if "br" not in page.variants:
+        print("variant br       missing: brotli is not installed (pip install -r requirements.txt)")
+    print()
+
+    def render():
+        with app.app_context():
+            render_template_string(pages.INDEX_HTML)
+
+    client = app.test_client()
+    cases = [
+        ("render (old path)", render),
+        ("prebuilt identity", lambda: page.respond("")),
+        ("prebuilt gzip", lambda: page.respond("gzip, deflate")),
+        ("prebuilt br", lambda: page.respond("gzip, deflate, br")),
+        ("prebuilt 304", lambda: page.respond("gzip", gz_etag)),
+        ("GET / identity", lambda: client.get("/")),
+        ("GET / gzip", lambda: client.get("/", headers={"Accept-Encoding": "gzip"})),
+        ("GET / 304", lambda: client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": gz_etag})),
+    ]
+    for name, fn in cases:
+        print(f"{name:<20} {_time(fn, opts):>9.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Cost of the /bookmark rate limiter on the accepted path.
+
+Reports µs per call for client_ip() (direct and behind Caddy) and
+TokenBucketLimiter.check() for a returning client, for a map that keeps
+evicting (every request a new IP), and for a rejected client, next to an
+end-to-end POST /bookmark through the Flask test client for scale.
+
+Usage:
+    python3 bench/bench_ratelimit.py [--number 100000] [--repeat 5]
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+scratch = tempfile.mkdtemp(prefix="bench-ratelimit-")
+os.environ.update(
+    BOOKMARKS_QUEUE_PATH=os.path.join(scratch, "queue.db"),
+    BOOKMARKS_STORE_PATH=os.path.join(scratch, "bookmarks.db"),
+    BOOKMARKS_LOG_LEVEL="WARNING",
+    BOOKMARKS_DEDUP_WINDOW="0",
+    MATTERMOST_WEBHOOK_URL="http://127.0.0.1:9/",
+)
+
+import ratelimit  # noqa: E402
+
+
+def _us(fn, number, repeat):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=100000, help="iterations per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is reported)")
+    opts = parser.parse_args()
+    n, r = opts.number, opts.repeat
+
+    headers = {"CF-Connecting-IP": "203.0.113.7", "X-Forwarded-For": "172.18.0.4"}.get
+    hot = ratelimit.TokenBucketLimiter(rate_per_minute=1e9, burst=1e9)
+    churn = ratelimit.TokenBucketLimiter(rate_per_minute=1e9, burst=1e9, max_keys=4096)
+    ips = (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in itertools.count())
+    blocked = ratelimit.TokenBucketLimiter(rate_per_minute=1e-6, burst=1)
+    blocked.check("203.0.113.9")
+
+    cases = [
+        ("client_ip direct", lambda: ratelimit.client_ip("198.51.100.1", headers)),
+        ("client_ip via proxy", lambda: ratelimit.client_ip("172.18.0.4", headers)),
+        ("check returning", lambda: hot.check("203.0.113.7")),
+        ("check new key+evict", lambda: churn.check(next(ips))),
+        ("check rejected", lambda: blocked.check("203.0.113.9")),
+    ]
+    for name, fn in cases:
+        print(f"{name:<22} {_us(fn, n, r):>8.3f} µs")
+
+    import secure_slack_bookmarks as svc  # noqa: E402
+    client = svc.app.test_client()
+    body = {"url": "https://example.com/a"}
+    limiter = svc.service.IP_LIMITER
+    limiter.burst = 1e9
+    best = {True: float("inf"), False: float("inf")}
+    for _ in range(r):  # interleave so disk/cache drift hits both equally
+        for on in (True, False):
+            limiter.rate = 1e9 if on else 0
+            best[on] = min(best[on], _us(lambda: client.post("/bookmark", json=body), max(1, n // 200), 1))
+    for on in (True, False):
+        print(f"{'POST /bookmark ' + ('limiter on' if on else 'limiter off'):<22} {best[on]:>8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Seed synthetic bookmarks into a scratch store and report /search latency.
+
+Builds a throwaway database (default 100k bookmarks drawn from a fixed
+vocabulary), then runs a mix of single-word, multi-word, prefix and
+host queries through BookmarkStore.search() and prints p50/p95/p99/max in ms.
+
+Then pages through every match of a few broad queries, once by offset and
+once by the next_after keyset, and fails if any match is returned twice,
+never, or out of bm25 order.
+
+Usage:
+    python3 bench/bench_search.py [--bookmarks 100000] [--queries 2000] [--db /tmp/x.db]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import store  # noqa: E402
+
+HOSTS = [f"{w}.{tld}" for w in (
+    "github", "news.ycombinator", "lwn", "arstechnica", "medium", "stackoverflow",
+    "youtube", "wikipedia", "reddit", "blog.cloudflare", "docs.python", "kitchenowl",
+    "selfhosted", "jellyfin", "immich", "nextcloud", "home-assistant", "lobste",
+) for tld in ("com", "org", "net", "io", "dev", "mk")]
+WORDS = (
+    "python rust docker sqlite backup caddy tunnel raspberry homelab recipe kubernetes "
+    "postgres linux kernel network dns pihole unbound vaultwarden monitoring grafana "
+    "prometheus latency benchmark cache index search fulltext async queue worker retry "
+    "webhook mattermost slack bookmark shortcut iphone android compose systemd socket "
+    "ssd smart disk storage raid zfs btrfs restore article tutorial guide release notes "
+    "security tls certificate proxy nginx performance memory profile flamegraph"
+).split()
+
+
+def _synthetic(rng, n):
+    now = time.time()
+    for i in range(n):
+        host = rng.choice(HOSTS)
+        path = "/".join(rng.sample(WORDS, rng.randint(1, 3)))
+        note = " ".join(rng.sample(WORDS, rng.randint(0, 6)))
+        yield f"https://{host}/{path}-{i}", note, "🔗", now - rng.random() * 3e7
+
+
+def _queries(rng, n):
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.4:
+            yield rng.choice(WORDS)
+        elif kind < 0.7:
+            yield " ".join(rng.sample(WORDS, 2))
+        elif kind < 0.85:
+            w = rng.choice(WORDS)
+            yield w[: max(3, len(w) // 2)]
+        else:
+            yield rng.choice(HOSTS).split(".")[0] + " " + rng.choice(WORDS)
+
+
+def _pct(sorted_ms, p):
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * p / 100))]
+
+
+def check_paging(s, queries, limit=7):
+    """Page through all matches of each query both ways: no duplicates, no gaps, bm25 order."""
+    conn = s._conn()
+    for q in queries:
+        match = store.fts_query(q)
+        expected = [r[0] for r in conn.execute(
+            "SELECT rowid FROM bookmarks_fts WHERE bookmarks_fts MATCH ? ORDER BY rank, rowid DESC",
+            (match,))]
+        for mode in ("offset", "after"):
+            seen, cursor, pages = [], None, 0
+            t = time.perf_counter()
+            while True:
+                if mode == "offset":
+                    page = s.search(q, limit, cursor or 0)
+                    cursor = page["next_offset"]
+                else:
+                    page = s.search(q, limit, after=cursor)
+                    cursor = page["next_after"]
+                seen.extend(r["id"] for r in page["results"])
+                pages += 1
+                if cursor is None:
+                    break
+            ms = (time.perf_counter() - t) * 1000 / pages
+            if seen != expected:
+                sys.exit(f"MISMATCH: paging {q!r} by {mode}: {len(seen) - len(set(seen))} duplicates, "
+                         f"{len(set(expected) - set(seen))} missing of {len(expected)}, "
+                         f"{'in' if set(seen) == set(expected) else 'and'} bm25 order: {seen[:5]}...")
+            print(f"paging {q!r} by {mode}: {len(expected)} matches in {pages} pages of {limit}, "
+                  f"{ms:.2f}ms/page")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bookmarks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--db", help="reuse/keep this database instead of a temp file")
+    opts = parser.parse_args()
+
+    rng = random.Random(42)
+    path = opts.db or os.path.join(tempfile.mkdtemp(prefix="bench-search-"), "bookmarks.db")
+    s = store.BookmarkStore(path)
+    have = s.count()
+    if have < opts.bookmarks:
+        t = time.perf_counter()
+        s.add_many(_synthetic(rng, opts.bookmarks - have))
+        print(f"seeded {opts.bookmarks - have} bookmarks in {time.perf_counter() - t:.1f}s ({path})")
+    print(f"store has {s.count()} bookmarks")
+
+    queries = list(_queries(rng, opts.queries))
+    for q in queries[:50]:  # warm the page cache
+        s.search(q, opts.limit)
+    timings = []
+    hits = 0
+    for q in queries:
+        t = time.perf_counter()
+        page = s.search(q, opts.limit)
+        timings.append((time.perf_counter() - t) * 1000)
+        hits += bool(page["results"])
+    timings.sort()
+    print(f"{len(queries)} queries, {hits} with results, page size {opts.limit}")
+    print(" ".join(f"p{p}={_pct(timings, p):.2f}ms" for p in (50, 95, 99)) + f" max={timings[-1]:.2f}ms")
+    check_paging(s, ("docker", "python rust", "sql"))
+
+
+if __name__ == "__main__":
+    main()
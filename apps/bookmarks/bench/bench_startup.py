@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Restart downtime: time from process start to the first answered request.
+
+Starts the app --repeat times per mode on a scratch queue/archive and times
+spawn -> first 200 from GET /health:
+
+  bind    the app binds BOOKMARKS_PORT itself (Restart= without a socket
+          unit); the client retries until the port opens, and every refused
+          connect is what a health check would see as "down"
+  socket  the port is opened up front and passed in with LISTEN_FDS, as
+          systemd/bookmarks.socket does; the request waits in the backlog
+
+Also reports the time to import the entry point (best of --repeat). Linux
+or macOS (needs sh for the LISTEN_PID handoff).
+
+Usage:
+    python3 bench/bench_startup.py [--repeat 5] [--server flask|uvicorn]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LISTEN_FD = 3
+# sh exec keeps the pid, so LISTEN_PID matches the Python process
+SOCKET_WRAPPER = ["sh", "-c", 'LISTEN_PID=$$ LISTEN_FDS=1 exec "$@"', "sh"]
+
+
+def _env(opts, scratch):
+    return dict(
+        os.environ,
+        BOOKMARKS_QUEUE_PATH=os.path.join(scratch, "queue.db"),
+        BOOKMARKS_STORE_PATH=os.path.join(scratch, "bookmarks.db"),
+        BOOKMARKS_LOG_LEVEL="WARNING",
+        BOOKMARKS_SERVER=opts.server,
+        BOOKMARKS_HOST="127.0.0.1",
+        BOOKMARKS_PORT=str(opts.port),
+        MATTERMOST_WEBHOOK_URL="http://127.0.0.1:9/",
+    )
+
+
+def _get_health(port, timeout):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request("GET", "/health")
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+
+def _first_response(opts, env, listener):
+    """Seconds from spawn to the first 200, plus refused connects on the way."""
+    cmd = [sys.executable, "secure_slack_bookmarks.py"]
+    kwargs = dict(cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if listener is not None:
+        fd = listener.fileno()
+        cmd = SOCKET_WRAPPER + cmd
+        kwargs.update(pass_fds=(LISTEN_FD,), preexec_fn=lambda: os.dup2(fd, LISTEN_FD))
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, **kwargs)
+    refused = 0
+    try:
+        while time.perf_counter() - started < 30:
+            if proc.poll() is not None:
+                sys.exit("server exited during startup")
+            try:
+                if _get_health(opts.port, 30) == 200:
+                    return time.perf_counter() - started, refused
+            except ConnectionRefusedError:
+                refused += 1
+                time.sleep(0.01)
+        sys.exit("server did not start")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _import_time(env):
+    code = ("import time; t = time.perf_counter(); import secure_slack_bookmarks; "
+            "print(time.perf_counter() - t)")
+    out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="starts per mode")
+    parser.add_argument("--server", choices=("flask", "uvicorn"), default="flask")
+    parser.add_argument("--port", type=int, default=5098)
+    opts = parser.parse_args()
+    scratch = tempfile.mkdtemp(prefix="bench-startup-")
+    env = _env(opts, scratch)
+
+    best = min(_import_time(env) for _ in range(opts.repeat))
+    print(f"import secure_slack_bookmarks  best {best * 1000:7.1f} ms")
+
+    listener = socket.create_server(("127.0.0.1", opts.port), backlog=128)
+    listener.set_inheritable(True)
+    modes = (("socket", listener), ("bind", None))
+    try:
+        for name, sock in modes:
+            if sock is None:
+                listener.close()  # the app binds the port itself
+            runs = [_first_response(opts, env, sock) for _ in range(opts.repeat)]
+            times = sorted(t for t, _ in runs)
+            refused = sum(r for _, r in runs) / len(runs)
+            print(f"{name:<8} first 200 after  best {times[0] * 1000:7.1f} ms  "
+                  f"median {times[len(times) // 2] * 1000:7.1f} ms  refused connects {refused:5.1f}/start")
+    finally:
+        listener.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Load test: what POST /bookmark sustains, end to end, against a stub webhook.
+
+Starts a stand-in Mattermost webhook in this process (--webhook-latency ms
+per post, --webhook-errors fraction answered with 500) and the app in a
+subprocess on a scratch queue/archive, pointed at it. --concurrency client
+threads, each on one keep-alive connection, then send a weighted mix of the
+request shapes clients really use for --duration seconds:
+
+  json   application/json {"url", "note", "token"} (web form, most Shortcuts)
+  form   application/x-www-form-urlencoded url=...&note=...&token=...
+  raw    text/plain body that is just the URL, token in X-Bookmarks-Token
+  ios    iOS Shortcuts "URL as key" bug: form body https%3A%2F%2F...=&token=
+
+Every request uses a fresh URL, so none is dropped as a duplicate. Reports
+requests/s and p50/p95/p99 latency per shape and overall, then how long the
+queue took to drain into the webhook. Results (with the settings, server
+mode and git revision) are written to --out as JSON; --compare prints the
+change against an earlier results file.
+
+--broken-sink adds a second sink that always fails (connection refused).
+Its circuit opens and its items stay queued, so instead of waiting for the
+queue to drain the run waits for the stub webhook to receive every accepted
+bookmark, and exits with an error if it does not.
+
+Usage:
+    python3 bench/loadtest.py [--server flask|uvicorn] [--workers 1] [--concurrency 16]
+        [--duration 20] [--mix json=4,form=2,raw=2,ios=1]
+        [--webhook-latency 50] [--webhook-errors 0.0] [--broken-sink] [--out FILE] [--compare FILE]
+"""
+import argparse
+import http.client
+import http.server
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TOKEN = "loadtest-token-loadtest-token"
+SHAPES = ("json", "form", "raw", "ios")
+
+
+class _Webhook(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, error_rate, seed):
+        super().__init__(("127.0.0.1", 0), _WebhookHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ok = 0
+        self.failed = 0
+
+
+class _WebhookHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real Mattermost behind a proxy
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        hook = self.server
+        time.sleep(hook.latency)
+        with hook.lock:
+            fail = hook.rng.random() < hook.error_rate
+            if fail:
+                hook.failed += 1
+            else:
+                hook.ok += 1
+        body = b"error" if fail else b"ok"
+        self.send_response(500 if fail else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _request(shape, n):
+    """(body, headers) for request number n of a shape."""
+    url = f"https://example.com/loadtest/{n}?ref=bench"
+    note = f"load test bookmark {n}"
+    if shape == "json":
+        return (json.dumps({"url": url, "note": note, "token": TOKEN}),
+                {"Content-Type": "application/json"})
+    if shape == "form":
+        return (urllib.parse.urlencode({"url": url, "note": note, "token": TOKEN}),
+                {"Content-Type": "application/x-www-form-urlencoded"})
+    if shape == "raw":
+        return url, {"Content-Type": "text/plain", "X-Bookmarks-Token": TOKEN}
+    return (f"{urllib.parse.quote(url, safe='')}=&token={TOKEN}",
+            {"Content-Type": "application/x-www-form-urlencoded"})
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SHAPES:
+            raise argparse.ArgumentTypeError(f"unknown shape {name!r} (use {', '.join(SHAPES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _pct(sorted_ms, p):
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * p / 100))]
+
+
+def _summary(samples, seconds):
+    ms = sorted(t for t, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    if not ms:
+        return {"requests": 0, "statuses": statuses}
+    return {
+        "requests": len(ms),
+        "rps": round(len(ms) / seconds, 1),
+        "p50_ms": round(_pct(ms, 50), 2),
+        "p95_ms": round(_pct(ms, 95), 2),
+        "p99_ms": round(_pct(ms, 99), 2),
+        "max_ms": round(ms[-1], 2),
+        "statuses": statuses,
+    }
+
+
+class _Counter:
+    """Unique request numbers shared by the client threads."""
+
+    def __init__(self):
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self._n += 1
+            return self._n
+
+
+def _client(port, shapes, weights, seed, counter, deadline, samples):
+    rng = random.Random(seed)
+    conn = None
+    while time.perf_counter() < deadline:
+        shape = rng.choices(shapes, weights)[0]
+        body, headers = _request(shape, counter())
+        if conn is None:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        started = time.perf_counter()
+        try:
+            conn.request("POST", "/bookmark", body=body.encode(), headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+            if resp.will_close:
+                conn.close()
+                conn = None
+        except (http.client.HTTPException, OSError) as e:
+            status = type(e).__name__
+            conn.close()
+            conn = None
+        samples.append((shape, (time.perf_counter() - started) * 1000, status))
+    if conn is not None:
+        conn.close()
+
+
+def _get_json(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def _wait_ready(port, proc):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            sys.exit("server exited during startup")
+        try:
+            return _get_json(port, "/health")
+        except (OSError, ValueError):
+            time.sleep(0.2)
+    sys.exit("server did not start")
+
+
+def _wait_drained(port, timeout):
+    """Seconds until the delivery queue is empty (None if it never was)."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if _get_json(port, "/queue")["depth"] == 0:
+            return time.perf_counter() - started
+        time.sleep(0.1)
+    return None
+
+
+def _wait_delivered(hook, accepted, timeout):
+    """Seconds until the stub webhook got `accepted` posts (None if it never did)."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if hook.ok >= accepted:
+            return time.perf_counter() - started
+        time.sleep(0.1)
+    return None
+
+
+def _closed_port():
+    """A local port nothing listens on, so sends to it are refused."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_rev():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(opts):
+    hook = _Webhook(opts.webhook_latency / 1000, opts.webhook_errors, opts.seed)
+    threading.Thread(target=hook.serve_forever, daemon=True).start()
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(
+        os.environ,
+        BOOKMARKS_QUEUE_PATH=os.path.join(scratch, "queue.db"),
+        BOOKMARKS_STORE_PATH=os.path.join(scratch, "bookmarks.db"),
+        BOOKMARKS_LOG_LEVEL="WARNING",
+        BOOKMARKS_RATE_PER_MINUTE="0",
+        BOOKMARKS_SECRET_TOKEN=TOKEN,
+        BOOKMARKS_SERVER=opts.server,
+        BOOKMARKS_WORKERS=str(opts.workers),
+        BOOKMARKS_HOST="127.0.0.1",
+        BOOKMARKS_PORT=str(opts.port),
+        BOOKMARKS_SINKS="",
+        MATTERMOST_WEBHOOK_URL=f"http://127.0.0.1:{hook.server_port}/hooks/loadtest",
+    )
+    if opts.broken_sink:
+        env["BOOKMARKS_SINKS"] = json.dumps([
+            {"type": "mattermost", "url": env["MATTERMOST_WEBHOOK_URL"]},
+            {"type": "webhook", "url": f"http://127.0.0.1:{_closed_port()}/hook", "name": "broken"},
+        ])
+    proc = subprocess.Popen([sys.executable, "secure_slack_bookmarks.py"], cwd=APP_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(opts.port, proc)
+        shapes, weights = list(opts.mix), list(opts.mix.values())
+        counter = _Counter()
+        samples = []
+        deadline = time.perf_counter() + opts.duration
+        clients = [
+            threading.Thread(target=_client, args=(opts.port, shapes, weights, opts.seed + i,
+                                                   counter, deadline, samples))
+            for i in range(opts.concurrency)
+        ]
+        started = time.perf_counter()
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+        elapsed = time.perf_counter() - started
+        if opts.broken_sink:
+            accepted = sum(1 for _, _, status in samples if status == 202)
+            drain = _wait_delivered(hook, accepted, opts.drain_timeout)
+        else:
+            drain = _wait_drained(opts.port, opts.drain_timeout)
+        queue = _get_json(opts.port, "/queue")
+    finally:
+        proc.terminate()
+        proc.wait()
+        hook.shutdown()
+
+    return {
+        "settings": {
+            "server": opts.server, "workers": opts.workers, "concurrency": opts.concurrency,
+            "duration": opts.duration, "mix": opts.mix, "webhook_latency_ms": opts.webhook_latency,
+            "webhook_errors": opts.webhook_errors, "broken_sink": opts.broken_sink, "seed": opts.seed,
+        },
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": _summary([(t, s) for _, t, s in samples], elapsed),
+        "shapes": {
+            shape: _summary([(t, s) for name, t, s in samples if name == shape], elapsed)
+            for shape in opts.mix
+        },
+        "delivery": {
+            "drain_seconds": None if drain is None else round(drain, 3),
+            "webhook_ok": hook.ok,
+            "webhook_errors": hook.failed,
+            "queue": queue,
+            "circuit": queue.get("circuit"),
+        },
+    }
+
+
+def _print(result, previous=None):
+    def line(name, s, old):
+        if not s.get("requests"):
+            return f"{name:<8} no requests"
+        text = (f"{name:<8} {s['requests']:>7} req {s['rps']:>8.1f}/s  "
+                f"p50 {s['p50_ms']:>7.2f}  p95 {s['p95_ms']:>7.2f}  p99 {s['p99_ms']:>7.2f} ms  "
+                + " ".join(f"{k}:{v}" for k, v in sorted(s["statuses"].items())))
+        if old and old.get("requests"):
+            text += (f"\n{'':<8} vs previous: {_delta(s['rps'], old['rps'])} req/s, "
+                     f"p50 {_delta(s['p50_ms'], old['p50_ms'])}, p99 {_delta(s['p99_ms'], old['p99_ms'])}")
+        return text
+
+    old_shapes = (previous or {}).get("shapes", {})
+    print(line("overall", result["overall"], (previous or {}).get("overall")))
+    for shape, s in result["shapes"].items():
+        print(line(shape, s, old_shapes.get(shape)))
+    d = result["delivery"]
+    if result["settings"].get("broken_sink"):
+        drained = ("stub webhook did not get every bookmark" if d["drain_seconds"] is None
+                   else f"stub webhook had every bookmark {d['drain_seconds']:.1f}s after load")
+    else:
+        drained = "did not drain" if d["drain_seconds"] is None else f"drained {d['drain_seconds']:.1f}s after load"
+    print(f"delivery {drained}; webhook ok {d['webhook_ok']}, errors {d['webhook_errors']}, "
+          f"circuit {d['circuit']}")
+
+
+def _delta(new, old):
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", choices=("flask", "uvicorn"), default="flask")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads / connections")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("json=4,form=2,raw=2,ios=1"),
+                        help="request shapes and weights")
+    parser.add_argument("--webhook-latency", type=float, default=50, help="stub webhook ms per post")
+    parser.add_argument("--webhook-errors", type=float, default=0.0,
+                        help="fraction of webhook posts answered with 500")
+    parser.add_argument("--broken-sink", action="store_true",
+                        help="add a sink that always fails; fail unless the stub still gets every bookmark")
+    parser.add_argument("--drain-timeout", type=float, default=60,
+                        help="seconds to wait for the queue to empty after the load")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=5097)
+    parser.add_argument("--out", help="results file (default loadtest-<server>-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    opts = parser.parse_args()
+
+    previous = None
+    if opts.compare:
+        with open(opts.compare) as f:
+            previous = json.load(f)
+    result = run(opts)
+    _print(result, previous)
+    out = opts.out or f"loadtest-{opts.server}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {out}")
+    if opts.broken_sink and result["delivery"]["drain_seconds"] is None:
+        sys.exit("FAILED: a broken sink held back delivery to the working one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Circuit breaker for delivery to one sink.
+
+Every sink has its own breaker. After BOOKMARKS_BREAKER_FAILURES consecutive
+failed sends to a sink its circuit opens: that sink is skipped, and items
+still waiting for it stay in the SQLite queue (the local spill) without
+spending retry attempts, while the other sinks keep receiving. After
+BOOKMARKS_BREAKER_RESET seconds one send is let through as a probe
+(half-open); success closes the circuit and the backlog for that sink is
+retried, failure opens it for another period.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+FAILURE_THRESHOLD = int(os.environ.get("BOOKMARKS_BREAKER_FAILURES", "5"))
+RESET_SECONDS = float(os.environ.get("BOOKMARKS_BREAKER_RESET", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+log = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    def __init__(self, name="webhook", failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS,
+                 on_transition=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.on_transition = on_transition
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None  # monotonic
+        self.transitions = deque(maxlen=20)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.failure_threshold > 0
+
+    def _move(self, state):
+        if state == self.state:
+            return
+        self.transitions.append({"at": time.time(), "from": self.state, "to": state})
+        if state == OPEN:
+            log.warning("Circuit for sink %s %s -> open after %d consecutive failures; "
+                        "holding deliveries for %ss", self.name, self.state, self.failures,
+                        self.reset_seconds)
+        else:
+            log.info("Circuit for sink %s %s -> %s", self.name, self.state, state)
+        self.state = state
+        if self.on_transition:
+            self.on_transition(state)
+
+    def allow(self):
+        """May a worker send to this sink now? In half-open, only one may."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self._move(HALF_OPEN)
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        """Returns True if this success closed the circuit."""
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state == CLOSED:
+                return False
+            self._move(CLOSED)
+            return True
+
+    def record_failure(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._move(OPEN)
+
+    def retry_in(self):
+        """Seconds until a probe is allowed (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in": round(self.retry_in(), 3),
+            "transitions": list(self.transitions),
+        }
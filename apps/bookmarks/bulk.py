@@ -0,0 +1,233 @@
+"""
+Streaming bulk import for POST /bookmarks/bulk.
+
+The body is fed to a push parser chunk by chunk (feed()/close()), so memory
+stays flat whatever the upload size:
+
+  NdjsonParser    one bookmark per line: a JSON object using the same keys
+                  as /bookmark ({"url": ..., "note": ...}) or a bare URL
+  NetscapeParser  a browser "Export bookmarks" HTML file (<DT><A HREF=...>)
+
+BulkImport validates each entry, skips recent duplicates, archives it and
+packs the webhook lines into messages of at most BULK_MESSAGE_MAX characters,
+each queued as one delivery: {"text", "count", "entries"}, where `text` is
+the packed message for chat sinks and `entries` the bookmarks themselves
+({"url", "note", "emoji"}) for the structured ones.
+"""
+import codecs
+import json
+import os
+import time
+from html.parser import HTMLParser
+
+import canonical
+import extract
+
+# Mattermost's default post limit is 16383 characters; stay well under it
+BULK_MESSAGE_MAX = int(os.environ.get("BOOKMARKS_BULK_MESSAGE_MAX", "4000"))
+MAX_LINE_BYTES = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+
+
+class NdjsonParser:
+    def __init__(self):
+        self._buf = bytearray()
+        self._skipping = False  # inside an over-long line
+        self.line_no = 0
+
+    def feed(self, chunk):
+        """Yield (line_no, entry dict | None, error | None) for complete lines."""
+        self._buf += chunk
+        while True:
+            nl = self._buf.find(b"\n")
+            if nl < 0:
+                if len(self._buf) > MAX_LINE_BYTES:
+                    if not self._skipping:
+                        self.line_no += 1
+                        yield self.line_no, None, "line too long"
+                    self._skipping = True
+                    self._buf.clear()
+                return
+            line = bytes(self._buf[:nl])
+            del self._buf[:nl + 1]
+            if self._skipping:
+                self._skipping = False
+                continue
+            yield from self._line(line)
+
+    def close(self):
+        if self._buf and not self._skipping:
+            yield from self._line(bytes(self._buf))
+        self._buf.clear()
+
+    def _line(self, raw):
+        self.line_no += 1
+        text = raw.decode("utf-8", "replace").strip()
+        if not text:
+            return
+        if text[0] in "{[":
+            try:
+                obj = json.loads(text)
+            except ValueError:
+                yield self.line_no, None, "invalid JSON"
+                return
+            if not isinstance(obj, dict):
+                yield self.line_no, None, "expected a JSON object"
+                return
+            url, note, emoji, _ = extract.extract_fields(obj)
+        else:
+            url, note, emoji, _ = extract.extract_fields({}, text)
+        yield self.line_no, {"url": url, "note": note, "emoji": emoji}, None
+
+
+class NetscapeParser(HTMLParser):
+    """Incremental parser for the Netscape bookmark file format."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._href = None
+        self._title = []
+        self._ready = []
+        self.line_no = 0  # counts <A> entries
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._href = dict(attrs).get("href") or ""
+            self._title = []
+
+    def handle_data(self, data):
+        if self._href is not None and sum(map(len, self._title)) < 1000:
+            self._title.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.line_no += 1
+            title = " ".join("".join(self._title).split())
+            self._ready.append((self.line_no, {"url": self._href.strip(), "note": title,
+                                               "emoji": extract.DEFAULT_EMOJI}, None))
+            self._href = None
+
+    def _drain(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    def feed(self, chunk):
+        super().feed(self._decoder.decode(chunk))
+        return self._drain()
+
+    def close(self):
+        super().feed(self._decoder.decode(b"", final=True))
+        super().close()
+        return self._drain()
+
+
+def detect_format(content_type, first_chunk):
+    ct = (content_type or "").lower()
+    if "html" in ct or first_chunk.lstrip()[:1] == b"<":
+        return "html"
+    return "ndjson"
+
+
+class BulkImport:
+    """Validates parsed entries and turns them into batched webhook messages.
+
+    `enqueue(item)` queues one delivery and returns its id, or None if the
+    queue is unavailable (the rest of the upload is then ignored and
+    `failed` is set); `archive(rows)` stores (url, note, emoji, created_at)
+    rows. `recent` is the shared duplicate filter.
+    """
+
+    def __init__(self, parser, enqueue, archive, recent, max_chars=BULK_MESSAGE_MAX):
+        self.parser = parser
+        self.enqueue = enqueue
+        self.archive = archive
+        self.recent = recent
+        self.max_chars = max_chars
+        self.accepted = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.messages = 0
+        self.failed = False
+        self.errors = []
+        self._lines = []
+        self._chars = 0
+        self._keys = []
+        self._entries = []
+        self._pending = set()
+        self._rows = []
+
+    def feed(self, chunk):
+        if not self.failed:
+            self._consume(self.parser.feed(chunk))
+
+    def close(self):
+        if not self.failed:
+            self._consume(self.parser.close())
+            self._flush()
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "duplicates": self.duplicates,
+            "messages": self.messages,
+            "lines": self.parser.line_no,
+            "errors": self.errors,
+        }
+
+    def _reject(self, line_no, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": error})
+
+    def _consume(self, parsed):
+        for line_no, entry, error in parsed:
+            if self.failed:
+                return
+            if error:
+                self._reject(line_no, error)
+                continue
+            url = entry["url"]
+            if not url:
+                self._reject(line_no, "URL is required")
+                continue
+            if not extract.is_valid_url(url):
+                self._reject(line_no, "Invalid URL (use http:// or https://)")
+                continue
+            key = canonical.canonicalize(url)
+            if key in self._pending or self.recent.get(key) is not None:
+                self.duplicates += 1
+                continue
+            self._add(entry, key)
+
+    def _add(self, entry, key):
+        emoji, note, url = entry["emoji"], entry["note"], entry["url"]
+        line = f"{emoji} {note} {url}" if note else f"{emoji} {url}"
+        if len(line) > self.max_chars:
+            line = f"{emoji} {url}"[: self.max_chars]
+        if self._lines and self._chars + len(line) + 1 > self.max_chars:
+            self._flush()
+            if self.failed:
+                return
+        self._lines.append(line)
+        self._chars += len(line) + 1
+        self._keys.append(key)
+        self._entries.append({"url": url, "note": note, "emoji": emoji})
+        self._pending.add(key)
+        self._rows.append((url, note, emoji, time.time()))
+        self.accepted += 1
+
+    def _flush(self):
+        if not self._lines:
+            return
+        queue_id = self.enqueue({"text": "\n".join(self._lines), "count": len(self._lines),
+                                 "entries": self._entries})
+        if queue_id is None:
+            self.failed = True
+            self.accepted -= len(self._lines)
+            return
+        self.archive(self._rows)
+        for key in self._keys:
+            self.recent.add(key, queue_id)
+        self.messages += 1
+        self._lines, self._chars, self._keys, self._rows, self._entries = [], 0, [], [], []
+        self._pending.clear()
@@ -0,0 +1,95 @@
+"""
+URL canonicalization and recent-duplicate detection.
+
+canonicalize() maps the different spellings of one link (tracking params,
+host case, default port, trailing slash, query order, iOS text fragments)
+to one key. RecentUrls remembers keys for a time window in a bounded LRU,
+so re-sharing the same link is acknowledged without another webhook post.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEDUP_WINDOW = float(os.environ.get("BOOKMARKS_DEDUP_WINDOW", "3600"))
+DEDUP_MAX_ENTRIES = int(os.environ.get("BOOKMARKS_DEDUP_MAX", "10000"))
+
+TRACKING_PARAMS = frozenset((
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "si",
+))
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize(url):
+    """Canonical form of a valid http(s) URL, used as the duplicate key."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = f"[{host}]" if ":" in host else host
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking(k)
+    )
+    # Safari "Copy Link to Highlight" adds #:~:text=...; it is not part of the page
+    fragment = "" if parts.fragment.startswith(":~:") else parts.fragment
+    return urlunsplit((scheme, netloc, path, urlencode(query), fragment))
+
+
+class RecentUrls:
+    """Bounded LRU of canonical URL -> (first seen time, value), with a TTL."""
+
+    def __init__(self, window=DEDUP_WINDOW, max_entries=DEDUP_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0   # hits inside the window (bookmarks_duplicates_suppressed)
+
+    def get(self, key):
+        """Value stored for `key` if it was seen inside the window, else None."""
+        if self.window <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] > self.window:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.suppressed += 1
+            return entry[1]
+
+    def add(self, key, value):
+        if self.window <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,286 @@
+"""
+Durable delivery queue for bookmarks.
+
+Accepted bookmarks are written to a SQLite (WAL) queue before the HTTP
+response goes out. A background worker drains the queue into the webhook
+with exponential backoff; items that run out of attempts are moved to a
+dead-letter table instead of being dropped.
+
+Claims are leased (next_attempt_at is pushed forward while an item is in
+flight), so an item that was being delivered when the process died is
+picked up again after a restart.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+QUEUE_PATH = os.environ.get(
+    "BOOKMARKS_QUEUE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "bookmarks-queue.db"),
+)
+MAX_ATTEMPTS = int(os.environ.get("BOOKMARKS_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE = float(os.environ.get("BOOKMARKS_BACKOFF_BASE", "2"))
+BACKOFF_MAX = float(os.environ.get("BOOKMARKS_BACKOFF_MAX", "600"))
+LEASE_SECONDS = 60
+POLL_SECONDS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS queue_next_attempt ON queue (next_attempt_at);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT
+);
+"""
+
+
+class Deferred(Exception):
+    """Raised by send() when an item has to wait without spending an attempt.
+
+    The worker saves the item (with any progress send recorded in it) and
+    makes it due again in `delay` seconds.
+    """
+
+    def __init__(self, reason, delay):
+        super().__init__(reason)
+        self.delay = delay
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number `attempts` (1-based)."""
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (attempts - 1)))
+
+
+class DeliveryQueue:
+    """SQLite-backed FIFO with retry scheduling and a dead-letter table."""
+
+    def __init__(self, path=QUEUE_PATH, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: we issue BEGIN/COMMIT ourselves
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, item):
+        """Persist a bookmark dict; returns its queue id."""
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO queue (payload, created_at, next_attempt_at) VALUES (?, ?, ?)",
+            (json.dumps(item, ensure_ascii=False), now, now),
+        )
+        self._wakeup.set()
+        return cur.lastrowid
+
+    def claim(self):
+        """Lease the next due item. Returns (id, item, attempts) or None."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM queue WHERE next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE queue SET next_attempt_at = ? WHERE id = ?",
+                    (now + LEASE_SECONDS, row[0]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not row:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def ack(self, item_id):
+        self._conn().execute("DELETE FROM queue WHERE id = ?", (item_id,))
+
+    def fail(self, item_id, error, item=None):
+        """Record a failed attempt: reschedule with backoff or dead-letter it.
+
+        `item`, if given, replaces the stored payload (send() may record
+        partial progress in it, e.g. which sinks already succeeded).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT payload, created_at, attempts FROM queue WHERE id = ?", (item_id,)
+            ).fetchone()
+            if row:
+                payload = row[0] if item is None else json.dumps(item, ensure_ascii=False)
+                attempts = row[2] + 1
+                if attempts >= self.max_attempts:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO dead_letter "
+                        "(id, payload, created_at, failed_at, attempts, last_error) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (item_id, payload, row[1], now, attempts, error),
+                    )
+                    conn.execute("DELETE FROM queue WHERE id = ?", (item_id,))
+                else:
+                    conn.execute(
+                        "UPDATE queue SET payload = ?, attempts = ?, next_attempt_at = ?, "
+                        "last_error = ? WHERE id = ?",
+                        (payload, attempts, now + backoff_delay(attempts), error, item_id),
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def defer(self, item_id, item, delay):
+        """Save `item` and make it due in `delay` seconds; attempts are unchanged."""
+        self._conn().execute(
+            "UPDATE queue SET payload = ?, next_attempt_at = ? WHERE id = ?",
+            (json.dumps(item, ensure_ascii=False), time.time() + delay, item_id),
+        )
+
+    def retry_now(self):
+        """Make items waiting out a long backoff due now (after an outage ends).
+
+        Items due within LEASE_SECONDS are left alone: that includes any item
+        another worker holds on lease. Returns the number rescheduled.
+        """
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE queue SET next_attempt_at = ? WHERE next_attempt_at > ?",
+            (now, now + LEASE_SECONDS),
+        )
+        if cur.rowcount:
+            self._wakeup.set()
+        return cur.rowcount
+
+    def next_due_in(self):
+        """Seconds until the next item is due (None if the queue is empty)."""
+        row = self._conn().execute("SELECT MIN(next_attempt_at) FROM queue").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def wait(self, timeout):
+        """Sleep until an item is enqueued or `timeout` seconds pass."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def stats(self):
+        conn = self._conn()
+        depth, oldest = conn.execute("SELECT COUNT(*), MIN(created_at) FROM queue").fetchone()
+        retrying = conn.execute("SELECT COUNT(*) FROM queue WHERE attempts > 0").fetchone()[0]
+        dead = conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        return {
+            "depth": depth,
+            "retrying": retrying,
+            "dead_letter": dead,
+            "oldest_age_seconds": round(time.time() - oldest, 3) if oldest else None,
+        }
+
+
+def run_worker(queue, send, logger=None, stop=None):
+    """Drain `queue` forever, calling send(item) for each due item.
+
+    `send` must raise on failure; the exception text is stored as last_error
+    and the item, which send may have updated, is saved for the retry. If
+    send raises Deferred, the item is saved and waits without using up an
+    attempt.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            claimed = queue.claim()
+        except sqlite3.Error:
+            if logger:
+                logger.exception("Delivery queue claim failed")
+            stop.wait(POLL_SECONDS)
+            continue
+        if claimed is None:
+            due = queue.next_due_in()
+            queue.wait(POLL_SECONDS if due is None else min(due, POLL_SECONDS))
+            continue
+        item_id, item, attempts = claimed
+        try:
+            send(item)
+        except Deferred as e:
+            queue.defer(item_id, item, e.delay)
+        except Exception as e:
+            if logger:
+                logger.warning("Delivery of bookmark %s failed (attempt %d): %s", item_id, attempts + 1, e)
+            queue.fail(item_id, str(e)[:500], item)
+        else:
+            queue.ack(item_id)
+
+
+def start_worker(queue, send, logger=None):
+    """Start the drain loop on a daemon thread; returns (thread, stop_event)."""
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=run_worker, args=(queue, send, logger, stop),
+        name="bookmarks-delivery", daemon=True,
+    )
+    thread.start()
+    return thread, stop
+
+
+async def run_async_worker(queue, send, wakeup, logger=None):
+    """asyncio twin of run_worker: `send` is a coroutine function.
+
+    SQLite calls run in the default executor; `wakeup` is an asyncio.Event
+    set by the request handler after enqueue.
+    """
+    import asyncio  # only the ASGI entry point needs it; keeps Flask startup lean
+
+    while True:
+        try:
+            claimed = await asyncio.to_thread(queue.claim)
+        except sqlite3.Error:
+            if logger:
+                logger.exception("Delivery queue claim failed")
+            await asyncio.sleep(POLL_SECONDS)
+            continue
+        if claimed is None:
+            due = await asyncio.to_thread(queue.next_due_in)
+            try:
+                await asyncio.wait_for(wakeup.wait(), POLL_SECONDS if due is None else min(due, POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            continue
+        item_id, item, attempts = claimed
+        try:
+            await send(item)
+        except Deferred as e:
+            await asyncio.to_thread(queue.defer, item_id, item, e.delay)
+        except Exception as e:
+            if logger:
+                logger.warning("Delivery of bookmark %s failed (attempt %d): %s", item_id, attempts + 1, e)
+            await asyncio.to_thread(queue.fail, item_id, str(e)[:500], item)
+        else:
+            await asyncio.to_thread(queue.ack, item_id)
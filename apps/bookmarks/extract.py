@@ -0,0 +1,154 @@
+"""
+Single-pass field extraction for /bookmark requests.
+
+Every request shape the service accepts (JSON, form, query string, the iOS
+Shortcuts "URL as key" bug, plain-text body) is reduced to one merged dict,
+which is walked once against a precomputed key table (exact keys first, then
+a lowercased lookup for the case-insensitive url keys). The precedence rules
+are the same as the original multi-scan version:
+
+  url   : exact known key (table order) > case-insensitive url/link/text/
+          content/input > any value that is a URL > any key that is a URL >
+          raw body
+  note, emoji, token : exact known key (table order)
+"""
+import json
+import re
+
+URL_RE = re.compile(r"^https?://[^\s]+$", re.IGNORECASE)
+
+DEFAULT_EMOJI = "🔗"
+
+# Exact keys per field, highest priority first
+URL_KEYS = ("url", "URL", "Url", "link", "Link", "LINK",
+            "bookmark_url", "Bookmark URL", "text", "Text",
+            "content", "Content", "input", "Input", "Shortcut Input")
+NOTE_KEYS = ("note", "Note", "description", "Description")
+EMOJI_KEYS = ("emoji", "Emoji")
+TOKEN_KEYS = ("token", "Token", "TOKEN")
+# Lowercased keys that match the url field in any casing
+URL_KEYS_ANY_CASE = ("url", "link", "text", "content", "input")
+
+_URL, _NOTE, _EMOJI, _TOKEN = range(4)
+
+
+def _build_key_table():
+    """exact key -> (field, rank, also a case-insensitive url key)"""
+    table = {}
+    for field, keys in ((_URL, URL_KEYS), (_NOTE, NOTE_KEYS),
+                        (_EMOJI, EMOJI_KEYS), (_TOKEN, TOKEN_KEYS)):
+        for rank, key in enumerate(keys):
+            table[key] = (field, rank, field == _URL and key.lower() in URL_KEYS_ANY_CASE)
+    return table
+
+
+KEY_TABLE = _build_key_table()
+_ANY_CASE = frozenset(URL_KEYS_ANY_CASE)
+_NO_RANK = len(URL_KEYS)
+
+
+def is_valid_url(s):
+    if not s or not isinstance(s, str):
+        return False
+    return bool(URL_RE.match(s.strip()))
+
+
+def redacted(data):
+    """Copy of a merged request dict with token values masked (for logging)."""
+    return {k: ("***" if k in TOKEN_KEYS else v) for k, v in data.items()}
+
+
+def parse_json_body(raw_body):
+    """Parse a JSON object body once; anything else returns None."""
+    if not raw_body:
+        return None
+    body = raw_body.lstrip()
+    if body.startswith("\ufeff"):
+        body = body[1:].lstrip()
+    if not body.startswith("{"):
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def merge_sources(json_data, form, args):
+    """Merge JSON + form + query into one dict (later sources win)."""
+    data = {}
+    if json_data:
+        data.update(json_data)
+    if form:
+        data.update(form)
+    if args:
+        data.update(args)
+    return data
+
+
+def extract_fields(data, raw_body=""):
+    """Return (url, note, emoji, token) from a merged request dict."""
+    ranks = [_NO_RANK, _NO_RANK, _NO_RANK, _NO_RANK]
+    found = [None, None, None, None]
+    url_any_case = None
+    # URL-looking values/keys; only regex-checked if no key supplies the url
+    maybe_values = []
+    maybe_keys = []
+    table_get = KEY_TABLE.get
+
+    for k, v in data.items():
+        if v is None or v == "":
+            # iOS Shortcuts bug: the URL arrives as a key with an empty value
+            if isinstance(k, str) and "://" in k:
+                maybe_keys.append(k)
+            continue
+        hit = table_get(k)
+        if hit is not None:
+            field, rank, any_case = hit
+            if rank < ranks[field]:
+                ranks[field] = rank
+                found[field] = v
+            if any_case and url_any_case is None:
+                url_any_case = v
+        elif isinstance(k, str):
+            if k.lower() in _ANY_CASE:
+                if url_any_case is None:
+                    url_any_case = v
+            elif "://" in k:
+                maybe_keys.append(k)
+        if isinstance(v, str) and "://" in v:
+            maybe_values.append(v)
+
+    url = None
+    if found[_URL] is not None:
+        url = str(found[_URL]).strip()
+    if not url and url_any_case is not None:
+        url = str(url_any_case).strip()
+    if not url:
+        url = _first_url(maybe_values) or _first_url(maybe_keys) or url
+    if not url and raw_body:
+        url = _url_from_raw_body(raw_body) or url
+
+    note = str(found[_NOTE]) if found[_NOTE] is not None else ""
+    emoji = str(found[_EMOJI]) if found[_EMOJI] is not None else DEFAULT_EMOJI
+    token = str(found[_TOKEN]) if found[_TOKEN] is not None else None
+    return url, note, emoji, token
+
+
+def _first_url(candidates):
+    for c in candidates:
+        if is_valid_url(c):
+            return c.strip()
+    return None
+
+
+def _url_from_raw_body(raw_body):
+    """Fallback: the raw body IS the URL (plain text body)."""
+    stripped = raw_body.strip()
+    if is_valid_url(stripped):
+        return stripped
+    if "\n" not in stripped and "://" in stripped:
+        for part in stripped.split():
+            if is_valid_url(part):
+                return part
+    return None
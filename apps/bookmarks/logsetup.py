@@ -0,0 +1,72 @@
+"""
+Logging for the bookmarks service.
+
+Records are handed to a QueueHandler and written to stderr (journald) by a
+QueueListener thread, so request threads never block on log I/O. The queue
+is bounded; when it is full, records are dropped and counted rather than
+stalling the request.
+
+Full request dumps are expensive to format, so callers ask dump_level()
+first: it returns DEBUG when debug logging is on, INFO for 1 in
+BOOKMARKS_LOG_SAMPLE requests (0 = never), and None otherwise.
+"""
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_LEVEL = os.environ.get("BOOKMARKS_LOG_LEVEL", "INFO").upper()
+DUMP_SAMPLE_N = int(os.environ.get("BOOKMARKS_LOG_SAMPLE", "0"))
+QUEUE_SIZE = 10000
+LOG_FORMAT = "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
+
+_request_counter = itertools.count(1)
+_listener = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def setup_logging(level=LOG_LEVEL):
+    """Route the root logger through a background writer thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    q = queue.Queue(QUEUE_SIZE)
+    root = logging.getLogger()
+    root.handlers[:] = [_DroppingQueueHandler(q)]
+    root.setLevel(level)
+    # httpx logs "HTTP Request: POST <url>" at INFO, and webhook URLs carry the secret
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _listener = logging.handlers.QueueListener(q, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def dropped_records():
+    """Records dropped so far in this process (bookmarks_log_records_dropped)."""
+    return _DroppingQueueHandler.dropped
+
+
+def dump_level(logger):
+    """Level to dump this request at, or None to skip formatting entirely."""
+    if logger.isEnabledFor(logging.DEBUG):
+        return logging.DEBUG
+    if DUMP_SAMPLE_N > 0 and next(_request_counter) % DUMP_SAMPLE_N == 0:
+        return logging.INFO
+    return None
@@ -0,0 +1,183 @@
+"""
+Prometheus text-format metrics for the bookmarks service (GET /metrics).
+
+A few lock-protected counters and fixed-bucket histograms, cheap enough to
+update on every request; nothing is formatted until a scrape. Values are
+per process: with several uvicorn workers each scrape sees one of them.
+"""
+import bisect
+import threading
+import time
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_REGISTRY = []
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '%s="%s"' % (n, str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _samples(self):
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self._samples():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value!r}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels):
+        return self._values.get(labels)
+
+
+class CallbackGauge(_Metric):
+    """Gauge read at scrape time; `fn()` returns {label tuple: value}."""
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames, fn):
+        super().__init__(name, doc, labelnames)
+        self.fn = fn
+
+    def _samples(self):
+        return sorted(self.fn().items())
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "start")
+
+    def __init__(self, hist, labels):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def totals(self, *labels):
+        """(count, sum) observed so far for `labels`."""
+        with self._lock:
+            entry = self._values.get(labels)
+            return (sum(entry[0]), entry[1]) if entry else (0, 0.0)
+
+    def time(self, *labels):
+        """Context manager observing the wall time of its block."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUESTS = Counter("bookmarks_requests_total", "HTTP requests by endpoint and status.",
+                   ("endpoint", "status"))
+REQUEST_SECONDS = Histogram("bookmarks_request_seconds", "HTTP request latency by endpoint.",
+                            ("endpoint",))
+IN_FLIGHT = Gauge("bookmarks_requests_in_flight", "HTTP requests being handled.")
+STAGE_SECONDS = Histogram("bookmarks_stage_seconds",
+                          "Latency of request stages: input (parse), validate, queue, webhook (all sinks).",
+                          ("stage",))
+SINK_SECONDS = Histogram("bookmarks_sink_seconds", "Latency of one send, by sink.", ("sink",))
+WEBHOOK_ERRORS = Counter("bookmarks_webhook_errors_total",
+                         "Failed sends by sink and kind (timeout, http, connection).",
+                         ("sink", "kind"))
+WEBHOOK_SUCCESS = Counter("bookmarks_webhook_success_total", "Successful sends by sink.",
+                          ("sink",))
+WEBHOOK_LAST_SUCCESS = Gauge("bookmarks_webhook_last_success_timestamp_seconds",
+                             "Unix time of the last successful send, by sink.", ("sink",))
+WEBHOOK_LAST_FAILURE = Gauge("bookmarks_webhook_last_failure_timestamp_seconds",
+                             "Unix time of the last failed send, by sink.", ("sink",))
+BREAKER_TRANSITIONS = Counter("bookmarks_webhook_circuit_transitions_total",
+                              "Circuit breaker transitions by sink and new state.", ("sink", "state"))
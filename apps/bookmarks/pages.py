@@ -0,0 +1,148 @@
+"""
+Static pages built once at startup and served as bytes.
+
+Each page keeps identity, gzip and br variants, each with its own strong
+ETag (brotli is in requirements.txt; without it, br is left out). respond() picks the
+variant from Accept-Encoding and answers 304 when If-None-Match matches.
+"""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred order when the client accepts several encodings equally
+ENCODINGS = ("br", "gzip", "identity")
+
+
+def _accepted_encodings(header):
+    """Parse Accept-Encoding into {coding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class StaticPage:
+    """An immutable page with pre-compressed variants and strong ETags."""
+
+    def __init__(self, body, content_type="text/html; charset=utf-8", max_age=300):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.content_type = content_type
+        self.cache_control = f"public, max-age={max_age}"
+        self.variants = {"identity": (body, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(body, 9, mtime=0), f'"{digest}-gz"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body), f'"{digest}-br"')
+
+    def choose_encoding(self, accept_encoding):
+        if not accept_encoding:
+            return "identity"
+        accepted = _accepted_encodings(accept_encoding)
+        best, best_q = "identity", accepted.get("identity", accepted.get("*", 0.001))
+        for coding in ENCODINGS:
+            if coding not in self.variants:
+                continue
+            q = accepted.get(coding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def respond(self, accept_encoding="", if_none_match=""):
+        """Return (status, body, headers) for a GET of this page."""
+        encoding = self.choose_encoding(accept_encoding)
+        body, etag = self.variants[encoding]
+        headers = {
+            "Content-Type": self.content_type,
+            "Cache-Control": self.cache_control,
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+        }
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return 304, b"", headers
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, body, headers
+
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <title>Bookmarks</title>
+  <style>
+    body { font-family: system-ui, sans-serif; max-width: 420px; margin: 2rem auto; padding: 0 1rem; }
+    h1 { font-size: 1.25rem; }
+    label { display: block; margin-top: 0.75rem; font-weight: 500; }
+    input { width: 100%; padding: 0.5rem; margin-top: 0.25rem; box-sizing: border-box; }
+    button { margin-top: 1rem; padding: 0.5rem 1rem; background: #0b5cff; color: white; border: none; border-radius: 6px; cursor: pointer; }
+    button:disabled { opacity: 0.6; cursor: not-allowed; }
+    .msg { margin-top: 1rem; padding: 0.5rem; border-radius: 6px; }
+    .err { background: #fee; color: #c00; }
+    .ok { background: #efe; color: #060; }
+  </style>
+</head>
+<body>
+  <h1>Bookmarks</h1>
+  <form id="f">
+    <label>URL <em>(required)</em></label>
+    <input type="url" name="url" id="url" placeholder="https://..." required>
+    <label>Note (optional)</label>
+    <input type="text" name="note" id="note" placeholder="Short description">
+    <label>Token</label>
+    <input type="password" name="token" id="token" placeholder="Secret token">
+    <button type="submit" id="btn">Send</button>
+  </form>
+  <div id="msg"></div>
+  <script>
+    document.getElementById("f").onsubmit = async function(e) {
+      e.preventDefault();
+      var btn = document.getElementById("btn"), msg = document.getElementById("msg");
+      btn.disabled = true; msg.textContent = ""; msg.className = "";
+      var u = document.getElementById("url").value.trim();
+      if (!u) { msg.textContent = "URL is required"; msg.className = "msg err"; btn.disabled = false; return; }
+      try {
+        var r = await fetch("/bookmark", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ url: u, note: document.getElementById("note").value.trim(), token: document.getElementById("token").value || undefined })
+        });
+        var j = await r.json();
+        msg.textContent = r.ok ? "Sent!" : (j.error || r.statusText);
+        msg.className = r.ok ? "msg ok" : "msg err";
+      } catch (err) { msg.textContent = err.message; msg.className = "msg err"; }
+      btn.disabled = false;
+    };
+  </script>
+</body>
+</html>
+"""
+
+# Built once: served as bytes with ETag / pre-compressed variants
+INDEX_PAGE = StaticPage(INDEX_HTML.encode("utf-8"))
@@ -0,0 +1,99 @@
+"""
+Token-bucket rate limiting for /bookmark.
+
+Each client key (client IP, or the token for authenticated requests) owns a
+two-float bucket in a fixed-size LRU map; when the map is full the least
+recently seen key is evicted, so memory is bounded no matter how many
+addresses a scanner uses.
+
+client_ip() only trusts forwarding headers when the TCP peer is one of
+BOOKMARKS_TRUSTED_PROXIES (Caddy reaches the app from the docker bridge).
+Behind cloudflared -> Caddy the real address is in CF-Connecting-IP; Caddy
+rewrites X-Forwarded-For to its own peer, which is used as a fallback.
+"""
+import functools
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RATE_PER_MINUTE = float(os.environ.get("BOOKMARKS_RATE_PER_MINUTE", "30"))
+RATE_BURST = float(os.environ.get("BOOKMARKS_RATE_BURST", "10"))
+MAX_CLIENTS = int(os.environ.get("BOOKMARKS_RATE_MAX_CLIENTS", "4096"))
+CLIENT_IP_HEADER = os.environ.get("BOOKMARKS_CLIENT_IP_HEADER", "CF-Connecting-IP")
+TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(n.strip(), strict=False)
+    for n in os.environ.get(
+        "BOOKMARKS_TRUSTED_PROXIES", "127.0.0.0/8,::1/128,172.16.0.0/12"
+    ).split(",")
+    if n.strip()
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _is_trusted(addr):
+    try:
+        ip = ipaddress.ip_address(addr)
+    except ValueError:
+        return False
+    return any(ip in net for net in TRUSTED_PROXIES)
+
+
+def client_ip(remote_addr, header):
+    """Best-effort client address. `header(name)` returns a request header or None."""
+    if not remote_addr or not _is_trusted(remote_addr):
+        return remote_addr or "unknown"
+    if CLIENT_IP_HEADER:
+        forwarded = (header(CLIENT_IP_HEADER) or "").strip()
+        if forwarded:
+            return forwarded
+    hops = [h.strip() for h in (header("X-Forwarded-For") or "").split(",") if h.strip()]
+    # Rightmost address that is not one of our own proxies
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else remote_addr
+
+
+class TokenBucketLimiter:
+    """`rate_per_minute` sustained with bursts of `burst`, per key."""
+
+    def __init__(self, rate_per_minute=RATE_PER_MINUTE, burst=RATE_BURST, max_keys=MAX_CLIENTS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill (monotonic)]
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, key):
+        """Take one token for `key`. Returns 0.0 if allowed, else seconds to wait."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evicted += 1
+                self._buckets[key] = [self.burst - 1.0, now]
+                return 0.0
+            self._buckets.move_to_end(key)
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                return 0.0
+            bucket[0] = tokens
+            self.rejected += 1
+            return (1.0 - tokens) / self.rate
+
+    def stats(self):
+        return {"tracked": len(self._buckets), "rejected": self.rejected, "evicted": self.evicted}
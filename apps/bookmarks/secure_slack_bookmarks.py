@@ -1,236 +1,249 @@
 """
 Slack/ Mattermost Bookmarks - POST a URL (+ optional note) to a webhook.
 Accepts JSON (any Content-Type), form data, query params, or raw URL body.
+
+Bookmarks are queued on disk (see delivery.py) and posted to the webhook by a
+background worker, so POST /bookmark answers with 202 without waiting on it.
+
+This is the Flask entry point. With BOOKMARKS_SERVER=uvicorn, running this file
+serves asgi_app.py (same endpoints) under uvicorn with BOOKMARKS_WORKERS
+processes instead. Started by systemd/bookmarks.socket, it serves the socket
+systemd passes in (see startup.py) rather than binding BOOKMARKS_HOST/PORT.
 """
-from flask import Flask, request, jsonify, render_template_string
-import requests
+from flask import Flask, Response, g, request, jsonify
 import os
-import re
-import sys
-import json as json_mod
+import time
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
+import startup
 
-app = Flask(__name__)
+startup.load_env()
+
+import extract
+import logsetup
+import metrics
+import pages
+import service
 
-MATTERMOST_WEBHOOK_URL = os.environ.get(
-    "MATTERMOST_WEBHOOK_URL",
-    os.environ.get("SLACK_WEBHOOK_URL", ""),
-)
-SECRET_TOKEN = os.environ.get("BOOKMARKS_SECRET_TOKEN", "")
+logsetup.setup_logging()
 
-URL_RE = re.compile(r"^https?://[^\s]+$", re.IGNORECASE)
+app = Flask(__name__)
 
+HOST = os.environ.get("BOOKMARKS_HOST", "0.0.0.0")
+PORT = int(os.environ.get("BOOKMARKS_PORT", "5000"))
+# "flask" (development server, default) or "uvicorn" (asgi_app.py)
+SERVER = os.environ.get("BOOKMARKS_SERVER", "flask").lower()
+WORKERS = int(os.environ.get("BOOKMARKS_WORKERS", "1"))
+BULK_CHUNK = 64 * 1024
 
-def _is_valid_url(s):
-    if not s or not isinstance(s, str):
-        return False
-    return bool(URL_RE.match(s.strip()))
+_is_valid_url = extract.is_valid_url
 
 
 def _get_input():
     """Extract (url, note, emoji, token) from any request format."""
     raw_body = request.get_data(as_text=True)
 
-    print(f"[DEBUG] Content-Type: {request.content_type}", file=sys.stderr, flush=True)
-    print(f"[DEBUG] Raw body: {raw_body[:500]!r}", file=sys.stderr, flush=True)
-
-    # Try to parse JSON from body regardless of Content-Type
-    json_data = None
-    try:
-        json_data = request.get_json(force=True, silent=True)
-    except Exception:
-        pass
-    if not isinstance(json_data, dict):
-        json_data = None
-
-    # Also try manual parse in case Flask's parser fails
-    if json_data is None and raw_body and raw_body.strip().startswith("{"):
-        try:
-            json_data = json_mod.loads(raw_body)
-            if not isinstance(json_data, dict):
-                json_data = None
-        except Exception:
-            pass
-
-    print(f"[DEBUG] JSON parsed: {json_data}", file=sys.stderr, flush=True)
-    print(f"[DEBUG] Form data: {dict(request.form) if request.form else 'EMPTY'}", file=sys.stderr, flush=True)
-    print(f"[DEBUG] Query args: {dict(request.args) if request.args else 'EMPTY'}", file=sys.stderr, flush=True)
+    # Parse JSON from body regardless of Content-Type (once)
+    json_data = extract.parse_json_body(raw_body)
 
     # Merge all sources into one dict (JSON + form + query)
-    data = {}
-    if json_data:
-        data.update(json_data)
-    if request.form:
-        data.update(request.form.to_dict(flat=True))
-    if request.args:
-        data.update(request.args.to_dict(flat=True))
-
-    print(f"[DEBUG] Merged data: {data}", file=sys.stderr, flush=True)
-
-    # Find URL: try known keys (case-insensitive), then any value that looks like a URL
-    url = None
-    for key in ("url", "URL", "Url", "link", "Link", "LINK",
-                "bookmark_url", "Bookmark URL", "text", "Text",
-                "content", "Content", "input", "Input", "Shortcut Input"):
-        if key in data and data[key] not in (None, ""):
-            url = str(data[key]).strip()
-            break
-
-    # Case-insensitive fallback
-    if not url:
-        for k, v in data.items():
-            if isinstance(k, str) and k.lower() in ("url", "link", "text", "content", "input"):
-                if v not in (None, ""):
-                    url = str(v).strip()
-                    break
-
-    # Any value that looks like a URL
-    if not url:
-        for v in data.values():
-            if isinstance(v, str) and _is_valid_url(v):
-                url = v.strip()
-                break
-
-    # iOS Shortcuts bug: URL ends up as a dict KEY instead of a value
-    if not url:
-        for k in data.keys():
-            if isinstance(k, str) and _is_valid_url(k):
-                url = k.strip()
-                break
-
-    # Fallback: raw body IS the URL (plain text body)
-    if not url and raw_body:
-        stripped = raw_body.strip()
-        if _is_valid_url(stripped):
-            url = stripped
-        elif "\n" not in stripped and "://" in stripped:
-            for part in stripped.split():
-                if _is_valid_url(part):
-                    url = part
-                    break
-
-    note = ""
-    emoji = "🔗"
-    token = None
-    for key in ("note", "Note", "description", "Description"):
-        if key in data and data[key] not in (None, ""):
-            note = str(data[key])
-            break
-    for key in ("emoji", "Emoji"):
-        if key in data and data[key] not in (None, ""):
-            emoji = str(data[key])
-            break
-    for key in ("token", "Token", "TOKEN"):
-        if key in data and data[key] not in (None, ""):
-            token = str(data[key])
-            break
-
-    print(f"[DEBUG] Result: url={url!r}, note={note!r}, token={'***' if token else None}", file=sys.stderr, flush=True)
+    data = extract.merge_sources(
+        json_data,
+        request.form.to_dict(flat=True) if request.form else None,
+        request.args.to_dict(flat=True) if request.args else None,
+    )
+
+    url, note, emoji, token = extract.extract_fields(data, raw_body)
+
+    level = logsetup.dump_level(app.logger)
+    if level is not None:
+        app.logger.log(
+            level,
+            "Request dump: content_type=%s body_bytes=%d json=%s form=%s args=%s merged=%s "
+            "-> url=%r note=%r token=%s",
+            request.content_type, len(raw_body), json_data is not None,
+            list(request.form), list(request.args), extract.redacted(data),
+            url, note, "***" if token else None,
+        )
     return url, note, emoji, token
 
 
-@app.route("/")
-def index():
-    return render_template_string(INDEX_HTML), 200
+class _CappedInput:
+    """wsgi.input wrapper for bodies sent without Content-Length (chunked).
 
+    Reads past `limit` bytes raise service.BodyTooLarge, answered with 413,
+    so at most limit + one read buffer is ever held.
+    """
 
-@app.route("/bookmark", methods=["POST"])
-def bookmark():
-    url, note, emoji, token = _get_input()
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.seen = 0
 
-    if not SECRET_TOKEN and not MATTERMOST_WEBHOOK_URL:
-        return jsonify({"error": "Server misconfigured: missing webhook or token"}), 500
+    def _take(self, data):
+        self.seen += len(data)
+        if self.seen > self.limit:
+            raise service.BodyTooLarge(self.limit)
+        return data
 
-    if SECRET_TOKEN and token != SECRET_TOKEN:
-        return jsonify({"error": "Unauthorized"}), 401
+    def read(self, size=-1):
+        room = self.limit - self.seen + 1
+        return self._take(self.stream.read(room if size is None or size < 0 else min(size, room)))
 
-    if not url:
-        return jsonify({"error": "URL is required"}), 400
+    def readline(self, size=-1):
+        room = self.limit - self.seen + 1
+        return self._take(self.stream.readline(room if size is None or size < 0 else min(size, room)))
 
-    if not _is_valid_url(url):
-        return jsonify({"error": "Invalid URL (use http:// or https://)"}), 400
 
-    if not MATTERMOST_WEBHOOK_URL:
-        return jsonify({"error": "Webhook not configured"}), 500
+@app.before_request
+def _start_timer():
+    g.started = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
 
-    message = f"{emoji} {note}\n{url}" if note else f"{emoji} {url}"
 
-    try:
-        resp = requests.post(
-            MATTERMOST_WEBHOOK_URL,
-            json={"text": message},
-            timeout=10,
-        )
-        resp.raise_for_status()
-        return jsonify({"status": "success"}), 200
-    except requests.exceptions.RequestException:
-        app.logger.exception("Failed to post bookmark to Mattermost webhook")
-        return jsonify({"error": "Failed to post bookmark"}), 502
+@app.before_request
+def _limit_body():
+    """Refuse oversized bodies before anything reads them."""
+    limit = service.body_limit(request.path)
+    if limit <= 0:
+        return None
+    if request.content_length is not None:
+        if request.content_length > limit:
+            resp, status = _json(*service.body_too_large(limit))
+            resp.headers["Connection"] = "close"  # the unread body is not drained
+            return resp, status
+    elif "wsgi.input" in request.environ:
+        request.environ["wsgi.input"] = _CappedInput(request.environ["wsgi.input"], limit)
+    return None
+
+
+@app.errorhandler(service.BodyTooLarge)
+def _body_too_large(exc):
+    return _json(*service.body_too_large(exc.limit))
+
+
+@app.after_request
+def _count_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else "other"
+    metrics.REQUESTS.inc(endpoint, response.status_code)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.started, endpoint)
+    return response
+
+
+@app.teardown_request
+def _end_request(exc):
+    metrics.IN_FLIGHT.dec()
+
+
+def _json(body, status):
+    resp = jsonify(body)
+    if status == 429:
+        resp.headers["Retry-After"] = str(body["retry_after"])
+    return resp, status
+
+
+@app.route("/")
+def index():
+    status, body, headers = pages.INDEX_PAGE.respond(
+        request.headers.get("Accept-Encoding", ""),
+        request.headers.get("If-None-Match", ""),
+    )
+    return Response(body, status=status, headers=headers)
+
+
+@app.route("/bookmark", methods=["POST"])
+def bookmark():
+    limited = service.check_client_rate(request.remote_addr, request.headers.get)
+    if limited:
+        return _json(*limited)
+    token, refused = service.check_header_token(request.headers.get)
+    if refused:
+        return _json(*refused)
+    with metrics.STAGE_SECONDS.time("input"):
+        url, note, emoji, body_token = _get_input()
+    return _json(*service.accept_bookmark(url, note, emoji, body_token if token is None else token))
+
+
+@app.route("/bookmarks/bulk", methods=["POST"])
+def bookmarks_bulk():
+    """Stream NDJSON or a browser bookmark export; the body is never buffered whole."""
+    limited = service.check_client_rate(request.remote_addr, request.headers.get)
+    if limited:
+        return _json(*limited)
+    token, refused = service.check_header_token(request.headers.get)
+    if refused:
+        return _json(*refused)
+    stream = request.stream
+    importer, refused = service.begin_bulk_import(
+        request.args.get("token") if token is None else token, request.args.get("format"),
+        request.content_type, stream.read(BULK_CHUNK),
+    )
+    if refused:
+        return _json(*refused)
+    for chunk in iter(lambda: stream.read(BULK_CHUNK), b""):
+        importer.feed(chunk)
+    return _json(*service.finish_bulk_import(importer))
+
+
+@app.route("/search")
+def search():
+    args = request.args
+    token = service.header_token(request.headers.get)
+    body, status = service.search_bookmarks(
+        args.get("q"), args.get("limit"), args.get("offset"),
+        args.get("token") if token is None else token, args.get("after"),
+    )
+    return _json(body, status)
+
+
+@app.route("/queue")
+def queue_status():
+    return jsonify(service.queue_status()), 200
 
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "ok", "service": "bookmarks"}), 200
-
-
-INDEX_HTML = """<!DOCTYPE html>
-<html>
-<head>
-  <meta charset="utf-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1">
-  <title>Bookmarks</title>
-  <style>
-    body { font-family: system-ui, sans-serif; max-width: 420px; margin: 2rem auto; padding: 0 1rem; }
-    h1 { font-size: 1.25rem; }
-    label { display: block; margin-top: 0.75rem; font-weight: 500; }
-    input { width: 100%; padding: 0.5rem; margin-top: 0.25rem; box-sizing: border-box; }
-    button { margin-top: 1rem; padding: 0.5rem 1rem; background: #0b5cff; color: white; border: none; border-radius: 6px; cursor: pointer; }
-    button:disabled { opacity: 0.6; cursor: not-allowed; }
-    .msg { margin-top: 1rem; padding: 0.5rem; border-radius: 6px; }
-    .err { background: #fee; color: #c00; }
-    .ok { background: #efe; color: #060; }
-  </style>
-</head>
-<body>
-  <h1>Bookmarks</h1>
-  <form id="f">
-    <label>URL <em>(required)</em></label>
-    <input type="url" name="url" id="url" placeholder="https://..." required>
-    <label>Note (optional)</label>
-    <input type="text" name="note" id="note" placeholder="Short description">
-    <label>Token</label>
-    <input type="password" name="token" id="token" placeholder="Secret token">
-    <button type="submit" id="btn">Send</button>
-  </form>
-  <div id="msg"></div>
-  <script>
-    document.getElementById("f").onsubmit = async function(e) {
-      e.preventDefault();
-      var btn = document.getElementById("btn"), msg = document.getElementById("msg");
-      btn.disabled = true; msg.textContent = ""; msg.className = "";
-      var u = document.getElementById("url").value.trim();
-      if (!u) { msg.textContent = "URL is required"; msg.className = "msg err"; btn.disabled = false; return; }
-      try {
-        var r = await fetch("/bookmark", {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ url: u, note: document.getElementById("note").value.trim(), token: document.getElementById("token").value || undefined })
-        });
-        var j = await r.json();
-        msg.textContent = r.ok ? "Sent!" : (j.error || r.statusText);
-        msg.className = r.ok ? "msg ok" : "msg err";
-      } catch (err) { msg.textContent = err.message; msg.className = "msg err"; }
-      btn.disabled = false;
-    };
-  </script>
-</body>
-</html>
-"""
+    return jsonify(service.health()), 200
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def _serve_flask(sock):
+    service.start_delivery_threads()
+    if sock is None:
+        app.run(host=HOST, port=PORT)
+        return
+    from werkzeug.serving import make_server
+    # werkzeug picks the address family from the host, so use the socket's own
+    host, port = sock.getsockname()[:2]
+    app.logger.info("Serving on inherited socket %s:%s", host, port)
+    make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+
+
+def _serve_uvicorn(sock):
+    import uvicorn
+    if sock is None:
+        uvicorn.run("asgi_app:app", host=HOST, port=PORT, workers=WORKERS, log_config=None)
+        return
+    config = uvicorn.Config("asgi_app:app", workers=WORKERS, log_config=None)
+    if WORKERS > 1:
+        import inspect
+        from uvicorn.supervisors import Multiprocess
+        kwargs = {"sockets": [sock]}
+        # Older uvicorn (0.29 up to at least 0.37) requires the worker target
+        if "target" in inspect.signature(Multiprocess).parameters:
+            kwargs["target"] = uvicorn.Server(config).run
+        Multiprocess(config, **kwargs).run()
+    else:
+        uvicorn.Server(config).run(sockets=[sock])
+
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    # Under systemd/bookmarks.socket the port is already open (LISTEN_FDS)
+    listener = startup.listen_socket()
+    if SERVER == "uvicorn":
+        _serve_uvicorn(listener)
+    else:
+        _serve_flask(listener)
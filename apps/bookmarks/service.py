@@ -0,0 +1,468 @@
+"""
+Framework-neutral core of the bookmarks service.
+
+Both entry points (secure_slack_bookmarks.py on Flask, asgi_app.py on
+uvicorn) turn a request into (url, note, emoji, token) and hand it to
+accept_bookmark(); delivery to the sinks (sinks.py) happens from the queue.
+"""
+import contextlib
+import hmac
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import breaker
+import bulk
+import canonical
+import delivery
+import extract
+import logsetup
+import metrics
+import ratelimit
+import sinks
+import store
+
+log = logging.getLogger(__name__)
+
+SECRET_TOKEN = os.environ.get("BOOKMARKS_SECRET_TOKEN", "")
+TOKEN_HEADER = "X-Bookmarks-Token"
+# Concurrent queue items in delivery per process (threads on Flask, tasks on ASGI)
+DELIVERY_CONCURRENCY = int(os.environ.get("BOOKMARKS_DELIVERY_CONCURRENCY", "4"))
+# Concurrent sink sends per process, shared by all items being delivered
+SINK_CONCURRENCY = int(os.environ.get("BOOKMARKS_SINK_CONCURRENCY", "8"))
+# Request body limits in bytes (0 = unlimited); bulk imports are streamed
+MAX_BODY_BYTES = int(os.environ.get("BOOKMARKS_MAX_BODY", str(64 * 1024)))
+BULK_MAX_BODY_BYTES = int(os.environ.get("BOOKMARKS_BULK_MAX_BODY", str(200 * 1024 * 1024)))
+
+SINKS = sinks.load_sinks()
+
+QUEUE = delivery.DeliveryQueue()
+STORE = store.BookmarkStore()
+RECENT = canonical.RecentUrls()
+# One circuit per sink, so a sink that is down does not hold back the others
+BREAKERS = {
+    sink.name: breaker.CircuitBreaker(
+        sink.name, on_transition=lambda state, name=sink.name: metrics.BREAKER_TRANSITIONS.inc(name, state),
+    )
+    for sink in SINKS
+}
+IP_LIMITER = ratelimit.TokenBucketLimiter()
+TOKEN_LIMITER = ratelimit.TokenBucketLimiter()
+
+# One keep-alive session (connection pool) shared by the sink threads; see _http_session()
+_session = None
+_session_lock = threading.Lock()
+_sink_pool = ThreadPoolExecutor(max_workers=SINK_CONCURRENCY, thread_name_prefix="bookmarks-sink")
+
+
+class BodyTooLarge(Exception):
+    """Raised by the capped body readers once a body passes its limit."""
+
+    def __init__(self, limit):
+        super().__init__(f"Request body over {limit} bytes")
+        self.limit = limit
+
+
+def body_limit(path):
+    """Max body bytes for a request path (0 = unlimited)."""
+    return BULK_MAX_BODY_BYTES if path == "/bookmarks/bulk" else MAX_BODY_BYTES
+
+
+def body_too_large(limit):
+    return {"error": "Request body too large", "max_bytes": limit}, 413
+
+
+def _too_many_requests(retry_after):
+    return {"error": "Too many requests", "retry_after": math.ceil(retry_after)}, 429
+
+
+def _token_valid(token):
+    if not SECRET_TOKEN:
+        return True
+    if token is None:
+        return False
+    return hmac.compare_digest(str(token).encode("utf-8"), SECRET_TOKEN.encode("utf-8"))
+
+
+def header_token(header):
+    """Token from `Authorization: Bearer ...` or X-Bookmarks-Token, else None."""
+    auth = header("Authorization") or ""
+    if auth[:7].lower() == "bearer ":
+        return auth[7:].strip()
+    return header(TOKEN_HEADER)
+
+
+def check_header_token(header):
+    """Auth fast path, run before the body is read.
+
+    Returns (token, None) where token is the header token or None when the
+    request carries none (the body token is then checked as before), or
+    (None, (response dict, 401)) for a wrong header token.
+    """
+    token = header_token(header)
+    if token is not None and not _token_valid(token):
+        return None, ({"error": "Unauthorized"}, 401)
+    return token, None
+
+
+def check_client_rate(remote_addr, header):
+    """Per-client-IP limit, checked before the body is read.
+
+    Returns a (response dict, 429) pair when the client is over its limit,
+    else None. `header(name)` looks up a request header.
+    """
+    retry_after = IP_LIMITER.check(ratelimit.client_ip(remote_addr, header))
+    return _too_many_requests(retry_after) if retry_after else None
+
+
+def _check_bookmark(url, token):
+    """Auth, rate and URL checks for accept_bookmark; a refusal pair or None."""
+    if not SECRET_TOKEN and not SINKS:
+        return {"error": "Server misconfigured: missing webhook or token"}, 500
+
+    if not _token_valid(token):
+        return {"error": "Unauthorized"}, 401
+
+    if token:
+        retry_after = TOKEN_LIMITER.check(token)
+        if retry_after:
+            return _too_many_requests(retry_after)
+
+    if not url:
+        return {"error": "URL is required"}, 400
+
+    if not extract.is_valid_url(url):
+        return {"error": "Invalid URL (use http:// or https://)"}, 400
+
+    if not SINKS:
+        return {"error": "Webhook not configured"}, 500
+    return None
+
+
+def accept_bookmark(url, note, emoji, token):
+    """Validate a bookmark and queue it. Returns (response dict, HTTP status)."""
+    with metrics.STAGE_SECONDS.time("validate"):
+        refused = _check_bookmark(url, token)
+    if refused:
+        return refused
+
+    with metrics.STAGE_SECONDS.time("queue"):
+        key = canonical.canonicalize(url)
+        first_id = RECENT.get(key)
+        if first_id is not None:
+            return {"status": "duplicate", "duplicate_of": first_id, "canonical_url": key}, 200
+
+        try:
+            queue_id = QUEUE.enqueue({"url": url, "note": note, "emoji": emoji})
+        except sqlite3.Error:
+            log.exception("Failed to queue bookmark")
+            return {"error": "Failed to queue bookmark"}, 503
+        RECENT.add(key, queue_id)
+        try:
+            STORE.add(url, note, emoji)
+        except sqlite3.Error:
+            # The archive is best-effort; delivery is already queued
+            log.exception("Failed to archive bookmark")
+    if not _circuits_closed():
+        # A sink is down: the bookmark waits in the queue for it until it recovers
+        return {"status": "queued", "id": queue_id, "delivery": "delayed"}, 202
+    return {"status": "queued", "id": queue_id}, 202
+
+
+def _enqueue_batch(item):
+    try:
+        return QUEUE.enqueue(item)
+    except sqlite3.Error:
+        log.exception("Failed to queue bulk bookmarks")
+        return None
+
+
+def _archive(rows):
+    try:
+        STORE.add_many(rows)
+    except sqlite3.Error:
+        log.exception("Failed to archive bulk bookmarks")
+
+
+def begin_bulk_import(token, fmt, content_type, first_chunk):
+    """Start a streaming bulk import (POST /bookmarks/bulk).
+
+    Returns (importer, None), or (None, (response dict, HTTP status)) when the
+    request is refused before any of the body is consumed. The caller feeds
+    the rest of the body to importer.feed() and answers with finish_bulk_import().
+    """
+    if not SECRET_TOKEN and not SINKS:
+        return None, ({"error": "Server misconfigured: missing webhook or token"}, 500)
+    if not _token_valid(token):
+        return None, ({"error": "Unauthorized"}, 401)
+    if token:
+        retry_after = TOKEN_LIMITER.check(token)
+        if retry_after:
+            return None, _too_many_requests(retry_after)
+    if not SINKS:
+        return None, ({"error": "Webhook not configured"}, 500)
+    fmt = (fmt or bulk.detect_format(content_type, first_chunk)).lower()
+    if fmt not in ("ndjson", "html"):
+        return None, ({"error": "format must be ndjson or html"}, 400)
+    parser = bulk.NetscapeParser() if fmt == "html" else bulk.NdjsonParser()
+    importer = bulk.BulkImport(parser, _enqueue_batch, _archive, RECENT)
+    importer.feed(first_chunk)
+    return importer, None
+
+
+def finish_bulk_import(importer):
+    """Flush the last message and return (summary dict, HTTP status)."""
+    summary = importer.close()
+    if importer.failed:
+        summary["error"] = "Failed to queue bookmarks"
+        return summary, 503
+    summary["status"] = "queued" if summary["messages"] else "empty"
+    return summary, 202 if summary["messages"] else 200
+
+
+def search_bookmarks(q, limit, offset, token, after=None):
+    """Full-text search of the local archive. Returns (response dict, HTTP status)."""
+    if not _token_valid(token):
+        return {"error": "Unauthorized"}, 401
+    if not q or not q.strip():
+        return {"error": "Query parameter q is required"}, 400
+    try:
+        limit = int(limit) if limit else 20
+        offset = int(offset) if offset else 0
+    except ValueError:
+        return {"error": "limit and offset must be integers"}, 400
+    if after:
+        try:
+            store.parse_cursor(after)
+        except ValueError:
+            return {"error": "after must be a next_after value from a previous page"}, 400
+    page = STORE.search(q, limit, offset, after or None)
+    page["query"] = q
+    return page, 200
+
+
+def _error_kind(exc):
+    if "Timeout" in type(exc).__name__:
+        return "timeout"
+    # requests.HTTPError and httpx.HTTPStatusError carry the response
+    if getattr(exc, "response", None) is not None:
+        return "http"
+    return "connection"
+
+
+@contextlib.contextmanager
+def sink_call(name):
+    """Record latency, errors and last success of one send to sink `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as exc:
+        metrics.SINK_SECONDS.observe(time.perf_counter() - start, name)
+        metrics.WEBHOOK_ERRORS.inc(name, _error_kind(exc))
+        metrics.WEBHOOK_LAST_FAILURE.set(time.time(), name)
+        raise
+    metrics.SINK_SECONDS.observe(time.perf_counter() - start, name)
+    metrics.WEBHOOK_SUCCESS.inc(name)
+    metrics.WEBHOOK_LAST_SUCCESS.set(time.time(), name)
+
+
+class DeliveryError(Exception):
+    """One or more sinks failed for a queued item."""
+
+
+def _circuits_closed():
+    return all(b.state == breaker.CLOSED for b in BREAKERS.values())
+
+
+def pending_sinks(item):
+    """Sinks this queued item has not reached yet (earlier attempts record them).
+
+    Returns (ready, held): held sinks have an open circuit and are skipped
+    this time.
+    """
+    done = item.get("delivered", ())
+    ready, held = [], []
+    for sink in SINKS:
+        if sink.name not in done:
+            (ready if BREAKERS[sink.name].allow() else held).append(sink)
+    return ready, held
+
+
+def record_results(item, results):
+    """Mark successful sinks in item["delivered"] and update their circuits.
+
+    `results` is [(sink, exception or None)]. The worker stores the updated
+    item with the retry, so a retry only goes to the sinks that failed.
+    Returns (failures, closed): "sink: error" texts, and whether a success
+    closed a circuit (the caller then retries the backlog with QUEUE.retry_now()).
+    """
+    failed, closed = [], False
+    for sink, exc in results:
+        if exc is None:
+            item.setdefault("delivered", []).append(sink.name)
+            closed = BREAKERS[sink.name].record_success() or closed
+        else:
+            BREAKERS[sink.name].record_failure()
+            failed.append(f"{sink.name}: {exc}")
+    return failed, closed
+
+
+def check_delivered(failed, held):
+    """Raise for the worker unless every pending sink was reached.
+
+    A failed sink spends one of the item's attempts (DeliveryError); sinks
+    only held by an open circuit make it wait for the probe instead
+    (delivery.Deferred).
+    """
+    if failed:
+        raise DeliveryError("; ".join(failed))
+    if held:
+        wait = min(BREAKERS[sink.name].retry_in() for sink in held)
+        raise delivery.Deferred("circuit open: " + ", ".join(sink.name for sink in held),
+                                max(wait, delivery.POLL_SECONDS))
+
+
+def _http_session():
+    """The shared requests.Session, created on the first webhook post.
+
+    requests is the slowest import in the app, so it is kept off the
+    startup path (see startup.py): a restart answers sooner.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=SINK_CONCURRENCY))
+            session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=SINK_CONCURRENCY))
+            _session = session
+    return _session
+
+
+def _send(sink, item):
+    with sink_call(sink.name):
+        sink.send(item, _http_session() if isinstance(sink, sinks.HttpSink) else None)
+
+
+def _try_send(sink, item):
+    try:
+        _send(sink, item)
+    except Exception as e:
+        return e
+    return None
+
+
+def deliver(item):
+    """Fan one queued item out to its pending sinks concurrently.
+
+    Raises if any sink failed so the worker retries, or defers the item while
+    a sink's circuit is open; total time is that of the slowest sink. The
+    async twin is asgi_app._deliver.
+    """
+    pending, held = pending_sinks(item)
+    with metrics.STAGE_SECONDS.time("webhook"):
+        if len(pending) == 1:
+            results = [(pending[0], _try_send(pending[0], item))]
+        else:
+            futures = [(sink, _sink_pool.submit(_send, sink, item)) for sink in pending]
+            results = [(sink, future.exception()) for sink, future in futures]
+    failed, closed = record_results(item, results)
+    if closed:
+        QUEUE.retry_now()
+    check_delivered(failed, held)
+
+
+def start_delivery_threads():
+    for _ in range(DELIVERY_CONCURRENCY):
+        delivery.start_worker(QUEUE, deliver, log)
+
+
+def circuit_states():
+    return {name: b.state for name, b in BREAKERS.items()}
+
+
+def queue_status():
+    stats = QUEUE.stats()
+    stats["circuit"] = circuit_states()
+    return stats
+
+
+def _reachable(last_ok, last_fail):
+    if last_ok is None and last_fail is None:
+        return None
+    return (last_ok or 0) >= (last_fail or 0)
+
+
+def sink_status():
+    """Per-sink delivery results in this process.
+
+    `reachable` is None until the first send, then whether the latest one
+    succeeded.
+    """
+    status = {}
+    for sink in SINKS:
+        last_ok = metrics.WEBHOOK_LAST_SUCCESS.value(sink.name)
+        last_fail = metrics.WEBHOOK_LAST_FAILURE.value(sink.name)
+        status[sink.name] = {
+            "type": sink.kind,
+            "reachable": _reachable(last_ok, last_fail),
+            "last_success": last_ok,
+            "last_failure": last_fail,
+            "delivered": metrics.WEBHOOK_SUCCESS.value(sink.name),
+            "errors": sum(metrics.WEBHOOK_ERRORS.value(sink.name, k)
+                          for k in ("timeout", "http", "connection")),
+            "circuit": BREAKERS[sink.name].stats(),
+        }
+    return status
+
+
+def webhook_status(per_sink):
+    """Summary over all sinks: unreachable if any sink's latest send failed."""
+    states = [s["reachable"] for s in per_sink.values()]
+    successes = [s["last_success"] for s in per_sink.values() if s["last_success"]]
+    return {
+        "configured": bool(SINKS),
+        "reachable": False if False in states else (True if True in states else None),
+        "last_success": max(successes) if successes else None,
+    }
+
+
+def health():
+    per_sink = sink_status()
+    webhook = webhook_status(per_sink)
+    degraded = (not webhook["configured"] or webhook["reachable"] is False
+                or not _circuits_closed())
+    return {
+        "status": "degraded" if degraded else "ok",
+        "service": "bookmarks",
+        "webhook": webhook,
+        "sinks": per_sink,
+        "circuit": circuit_states(),
+        "rate_limit": {"ip": IP_LIMITER.stats(), "token": TOKEN_LIMITER.stats()},
+    }
+
+
+def _queue_gauges():
+    stats = QUEUE.stats()
+    return {("queued",): stats["depth"], ("retrying",): stats["retrying"],
+            ("dead_letter",): stats["dead_letter"]}
+
+
+metrics.CallbackGauge(
+    "bookmarks_webhook_circuit_state", "1 for the current circuit state, by sink.", ("sink", "state"),
+    lambda: {(name, st): int(b.state == st) for name, b in BREAKERS.items()
+             for st in (breaker.CLOSED, breaker.OPEN, breaker.HALF_OPEN)},
+)
+metrics.CallbackGauge("bookmarks_queue_items",
+                      "Delivery queue items: queued (all), retrying (subset), dead_letter.",
+                      ("state",), _queue_gauges)
+metrics.CallbackGauge("bookmarks_duplicates_suppressed",
+                      "Bookmarks answered from the recent-duplicate window instead of posted again.", (),
+                      lambda: {(): RECENT.suppressed})
+metrics.CallbackGauge("bookmarks_log_records_dropped",
+                      "Log records dropped because the log queue was full.", (),
+                      lambda: {(): logsetup.dropped_records()})
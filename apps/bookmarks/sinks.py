@@ -0,0 +1,167 @@
+"""
+Delivery destinations ("sinks") for queued bookmarks.
+
+BOOKMARKS_SINKS is a JSON list; every queued bookmark is sent to each entry:
+
+  [{"type": "mattermost", "url": "https://mattermost.example/hooks/xxx"},
+   {"type": "slack", "url": "https://hooks.slack.com/services/...", "timeout": 5},
+   {"type": "file", "path": "/mnt/ssd/apps/bookmarks/bookmarks.jsonl"},
+   {"type": "webhook", "url": "https://example.com/hook", "name": "archive"}]
+
+`name` defaults to the type (numbered if repeated) and is what /health and
+/metrics report; `timeout` defaults to BOOKMARKS_WEBHOOK_TIMEOUT. Without
+BOOKMARKS_SINKS there is one Mattermost sink for MATTERMOST_WEBHOOK_URL (or
+SLACK_WEBHOOK_URL), as before.
+"""
+import json
+import os
+import threading
+import time
+
+import extract
+
+MATTERMOST_WEBHOOK_URL = os.environ.get(
+    "MATTERMOST_WEBHOOK_URL",
+    os.environ.get("SLACK_WEBHOOK_URL", ""),
+)
+WEBHOOK_TIMEOUT = float(os.environ.get("BOOKMARKS_WEBHOOK_TIMEOUT", "10"))
+SINKS_JSON = os.environ.get("BOOKMARKS_SINKS", "")
+
+SLACK_SECTION_MAX = 3000  # Slack's limit for one section block's text
+
+
+def format_text(item):
+    """Plain-text message for a queued item (Mattermost and Slack fallback)."""
+    if "text" in item:  # pre-formatted batch from a bulk import
+        return item["text"]
+    url, note, emoji = item["url"], item.get("note", ""), item.get("emoji", extract.DEFAULT_EMOJI)
+    return f"{emoji} {note}\n{url}" if note else f"{emoji} {url}"
+
+
+def _slack_escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _slack_url(url):
+    """A URL for <url|label>: escaped like text, and "|" (the label separator) percent-encoded."""
+    return _slack_escape(url).replace("|", "%7C")
+
+
+def _chunks(lines, limit):
+    chunk, size = [], 0
+    for line in lines:
+        if chunk and size + len(line) + 1 > limit:
+            yield "\n".join(chunk)
+            chunk, size = [], 0
+        chunk.append(line[:limit])
+        size += len(line) + 1
+    if chunk:
+        yield "\n".join(chunk)
+
+
+class HttpSink:
+    kind = "webhook"
+
+    def __init__(self, name, url, timeout=WEBHOOK_TIMEOUT):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+
+    def body(self, item):
+        """Generic webhook: the queued item as JSON; a bulk batch as its entries."""
+        if "entries" in item:
+            return {"count": item["count"], "entries": item["entries"]}
+        return {k: v for k, v in item.items() if k != "delivered"}
+
+    def send(self, item, session):
+        resp = session.post(self.url, json=self.body(item), timeout=self.timeout)
+        resp.raise_for_status()
+
+    async def asend(self, item, client):
+        resp = await client.post(self.url, json=self.body(item), timeout=self.timeout)
+        resp.raise_for_status()
+
+
+class MattermostSink(HttpSink):
+    kind = "mattermost"
+
+    def body(self, item):
+        return {"text": format_text(item)}
+
+
+class SlackSink(HttpSink):
+    kind = "slack"
+
+    def body(self, item):
+        if "text" in item:
+            lines = [_slack_escape(line) for line in item["text"].split("\n")]
+        else:
+            url, note = item["url"], item.get("note", "")
+            emoji = item.get("emoji", extract.DEFAULT_EMOJI)
+            url = _slack_url(url)
+            link = f"<{url}|{_slack_escape(note)}>" if note else f"<{url}>"
+            lines = [f"{emoji} {link}"]
+        blocks = [
+            {"type": "section", "text": {"type": "mrkdwn", "text": chunk}}
+            for chunk in _chunks(lines, SLACK_SECTION_MAX)
+        ]
+        return {"text": format_text(item), "blocks": blocks}
+
+
+class FileSink:
+    """Appends one JSON line per bookmark (per entry of a bulk batch); `session`/`client` are unused."""
+    kind = "file"
+
+    def __init__(self, name, path, timeout=WEBHOOK_TIMEOUT):
+        self.name = name
+        self.path = path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def send(self, item, session=None):
+        now = time.time()
+        records = item["entries"] if "entries" in item else [
+            {k: v for k, v in item.items() if k != "delivered"}]
+        lines = "".join(json.dumps(dict(record, delivered_at=now), ensure_ascii=False) + "\n"
+                        for record in records)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    async def asend(self, item, client=None):
+        import asyncio  # loaded already under ASGI; not imported at startup on Flask
+
+        await asyncio.to_thread(self.send, item)
+
+
+SINK_TYPES = {cls.kind: cls for cls in (MattermostSink, SlackSink, HttpSink, FileSink)}
+
+
+def load_sinks(spec=SINKS_JSON, default_url=MATTERMOST_WEBHOOK_URL, timeout=WEBHOOK_TIMEOUT):
+    """Build the sink list from BOOKMARKS_SINKS; raises ValueError if it is invalid."""
+    if not spec.strip():
+        return [MattermostSink("mattermost", default_url, timeout)] if default_url else []
+    try:
+        entries = json.loads(spec)
+    except ValueError as e:
+        raise ValueError(f"BOOKMARKS_SINKS is not valid JSON: {e}") from None
+    if not isinstance(entries, list):
+        raise ValueError("BOOKMARKS_SINKS must be a JSON list")
+    sinks, seen = [], {}
+    for entry in entries:
+        kind = entry.get("type") if isinstance(entry, dict) else None
+        cls = SINK_TYPES.get(kind)
+        if cls is None:
+            raise ValueError(f"BOOKMARKS_SINKS: unknown sink {entry!r} "
+                             f"(type must be one of {', '.join(SINK_TYPES)})")
+        target = entry.get("path" if cls is FileSink else "url")
+        if not target:
+            raise ValueError(f"BOOKMARKS_SINKS: {kind} sink needs "
+                             f"{'path' if cls is FileSink else 'url'}")
+        name = entry.get("name")
+        if not name:
+            seen[kind] = seen.get(kind, 0) + 1
+            name = kind if seen[kind] == 1 else f"{kind}{seen[kind]}"
+        if any(s.name == name for s in sinks):
+            raise ValueError(f"BOOKMARKS_SINKS: duplicate sink name {name!r}")
+        sinks.append(cls(name, target, float(entry.get("timeout", timeout))))
+    return sinks
@@ -0,0 +1,49 @@
+"""
+Process startup helpers shared by both entry points.
+
+load_env() reads .env without paying for python-dotenv when there is nothing
+to load. listen_socket() picks up a listening socket passed by systemd
+socket activation (systemd/bookmarks.socket), so port 5000 keeps accepting
+connections while the service restarts; they are answered once it is up.
+"""
+import os
+import socket
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SD_LISTEN_FDS_START = 3  # first fd systemd passes (sd_listen_fds(3))
+
+
+def load_env():
+    """Load .env from the app directory (or cwd) without overriding set vars.
+
+    BOOKMARKS_DOTENV=0 skips it: the systemd unit has already read the same
+    file through EnvironmentFile=, so there is no need to import dotenv.
+    """
+    if os.environ.get("BOOKMARKS_DOTENV", "1") == "0":
+        return
+    for path in (os.path.join(APP_DIR, ".env"), os.path.join(os.getcwd(), ".env")):
+        if os.path.isfile(path):
+            break
+    else:
+        return
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv(path)
+
+
+def listen_socket():
+    """The socket systemd passed us (LISTEN_FDS), or None to bind our own.
+
+    The LISTEN_* variables are removed so worker processes do not pick the
+    fd up a second time.
+    """
+    pid = os.environ.pop("LISTEN_PID", None)
+    count = os.environ.pop("LISTEN_FDS", "0")
+    os.environ.pop("LISTEN_FDNAMES", None)
+    if pid != str(os.getpid()) or int(count) < 1:
+        return None
+    sock = socket.socket(fileno=SD_LISTEN_FDS_START)
+    sock.set_inheritable(True)
+    return sock
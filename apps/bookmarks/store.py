@@ -0,0 +1,151 @@
+"""
+Local bookmark archive with SQLite FTS5 full-text search.
+
+Every accepted bookmark is also written here (independently of webhook
+delivery). bookmarks_fts is an external-content FTS5 index over url, host
+and note, kept in sync by triggers. search() ranks the whole match set
+with bm25 and orders by (rank, rowid), so pages never overlap or skip a
+match. Pages are fetched by limit/offset or, cheaper for deep pages, by
+the (rank, rowid) keyset in next_after.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+STORE_PATH = os.environ.get(
+    "BOOKMARKS_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "bookmarks.db"),
+)
+MAX_PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookmarks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    emoji TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS bookmarks_fts USING fts5(
+    url, host, note,
+    content='bookmarks', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS bookmarks_ai AFTER INSERT ON bookmarks BEGIN
+    INSERT INTO bookmarks_fts (rowid, url, host, note) VALUES (new.id, new.url, new.host, new.note);
+END;
+CREATE TRIGGER IF NOT EXISTS bookmarks_ad AFTER DELETE ON bookmarks BEGIN
+    INSERT INTO bookmarks_fts (bookmarks_fts, rowid, url, host, note)
+    VALUES ('delete', old.id, old.url, old.host, old.note);
+END;
+CREATE TRIGGER IF NOT EXISTS bookmarks_au AFTER UPDATE ON bookmarks BEGIN
+    INSERT INTO bookmarks_fts (bookmarks_fts, rowid, url, host, note)
+    VALUES ('delete', old.id, old.url, old.host, old.note);
+    INSERT INTO bookmarks_fts (rowid, url, host, note) VALUES (new.id, new.url, new.host, new.note);
+END;
+"""
+# bm25 column weights: a hit in the note or host counts more than one in the URL path
+RANK_CONFIG = "bm25(1.0, 2.0, 3.0)"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def parse_cursor(after):
+    """Split a next_after cursor into (rank, rowid); ValueError if malformed."""
+    rank, sep, rowid = str(after).rpartition(":")
+    if not sep:
+        raise ValueError(f"bad search cursor {after!r}")
+    return float(rank), int(rowid)
+
+
+def fts_query(q):
+    """Turn free text into a safe FTS5 query: all terms, last one as a prefix."""
+    terms = _TERM_RE.findall(q or "")
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class BookmarkStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT INTO bookmarks_fts (bookmarks_fts, rank) VALUES ('rank', ?)", (RANK_CONFIG,))
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, url, note="", emoji="", created_at=None):
+        conn = self._conn()
+        cur = conn.execute(
+            "INSERT INTO bookmarks (url, host, note, emoji, created_at) VALUES (?, ?, ?, ?, ?)",
+            (url, (urlsplit(url).hostname or ""), note or "", emoji or "",
+             created_at if created_at is not None else time.time()),
+        )
+        conn.commit()
+        return cur.lastrowid
+
+    def add_many(self, rows):
+        """Bulk insert (url, note, emoji, created_at) tuples in one transaction."""
+        conn = self._conn()
+        conn.executemany(
+            "INSERT INTO bookmarks (url, host, note, emoji, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((url, (urlsplit(url).hostname or ""), note or "", emoji or "", created_at)
+             for url, note, emoji, created_at in rows),
+        )
+        conn.commit()
+
+    def search(self, q, limit=20, offset=0, after=None):
+        """Ranked full-text search.
+
+        Returns {"results": [...], "next_offset": int|None, "next_after": str|None}.
+        Pass next_after back as `after` to page by keyset instead of offset.
+        """
+        match = fts_query(q)
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        if match is None:
+            return {"results": [], "next_offset": None, "next_after": None}
+        if after is None:
+            where, params = "", (match, limit + 1, offset)
+        else:
+            rank, rowid = parse_cursor(after)
+            offset = 0
+            where = " AND (rank > ? OR (rank = ? AND rowid < ?))"
+            params = (match, rank, rank, rowid, limit + 1, 0)
+        # Rank inside FTS5 first, then join only the page we return
+        rows = self._conn().execute(
+            "SELECT b.id, b.url, b.note, b.emoji, b.created_at, hit.rank FROM ("
+            "  SELECT rowid, rank FROM bookmarks_fts WHERE bookmarks_fts MATCH ?" + where +
+            "  ORDER BY rank, rowid DESC LIMIT ? OFFSET ?"
+            ") hit JOIN bookmarks b ON b.id = hit.rowid ORDER BY hit.rank, hit.rowid DESC",
+            params,
+        ).fetchall()
+        results = [
+            {"id": r[0], "url": r[1], "note": r[2], "emoji": r[3], "created_at": r[4]}
+            for r in rows[:limit]
+        ]
+        more = len(rows) > limit
+        return {
+            "results": results,
+            "next_offset": offset + limit if more and after is None else None,
+            "next_after": f"{rows[limit - 1][5]!r}:{rows[limit - 1][0]}" if more else None,
+        }
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM bookmarks").fetchone()[0]
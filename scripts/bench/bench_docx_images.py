@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Image detection in the recipe .docx parser: per-run XML scan vs image index.
+
+Builds a synthetic meal-plan document (default 100 days x 4 meals, about
+200 pages, a photo on every --photo-every'th recipe), then times how
+parse_recipes_from_docx() finds recipe images:
+
+  per-run xml   the previous approach: serialize run.element.xml for every
+                run of every empty paragraph, and again for every run of
+                every line while a recipe has no image, then regex r:embed
+  index         index_images(): one XPath query per document
+
+Only the detection is timed (the paragraph walk is shared); both must pick
+the same image for every recipe. Also reports the full parse time, for
+scale. Word splits text into many runs (formatting, spell-check, edits);
+--runs sets how many per line, and the per-run scan grows with it.
+
+Usage:
+    python3 scripts/bench/bench_docx_images.py [--days 100] [--photo-every 1] [--runs 4] [--repeat 3]
+"""
+import argparse
+import importlib.util
+import io
+import os
+import random
+import re
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from docx import Document
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SCRIPTS)  # the importer's own imports (recipe_ingredients)
+spec = importlib.util.spec_from_file_location(
+    "import_recipes", os.path.join(SCRIPTS, "import-recipes-to-kitchenowl.py"))
+importer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(importer)
+
+MEALS = ("ПОЈАДОК", "УЖИНА", "РУЧЕК", "ВЕЧЕРА")
+FOODS = ("јајца", "овесни снегулки", "млеко", "пилешко филе", "ориз", "домати", "сирење", "мед")
+
+
+def _png(rng, width=96, height=64):
+    raw = b"".join(b"\x00" + bytes(rng.randrange(256) for _ in range(width * 3)) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def build_document(path, days, photo_every, runs, seed=42):
+    rng = random.Random(seed)
+    doc = Document()
+
+    def line(text):
+        para = doc.add_paragraph()
+        step = -(-len(text) // runs)
+        for i in range(0, len(text), step):
+            para.add_run(text[i:i + step])
+
+    n = 0
+    for day in range(1, days + 1):
+        line(f"Ден {day}: |Military FIT|")
+        for meal in MEALS:
+            n += 1
+            line(f"{meal}: Рецепт {day}-{meal}")
+            if photo_every and n % photo_every == 0:
+                doc.add_paragraph().add_run().add_picture(io.BytesIO(_png(rng)))
+            line("Состојки")
+            for _ in range(6):
+                line(f"– {rng.randint(1, 300)} гр {rng.choice(FOODS)}")
+            line("Начин на припрема")
+            line("1. Измешајте ги сите состојки во сад.")
+            line("Печете 20 минути на 180 степени, па сервирајте топло.")
+            line("Калориска вредност")
+            line(f"Калории: {rng.randint(200, 600)}kcal | Протеини: 25g")
+    doc.save(path)
+
+
+def _recipe_paragraphs(doc):
+    """(recipe number, paragraph) as the parser walks them; -1 before the first recipe."""
+    n = -1
+    for para in doc.paragraphs:
+        if re.match(r"^(ПОЈАДОК|РУЧЕК|ВЕЧЕРА|УЖИНА)\s*:", para.text.strip()):
+            n += 1
+            continue
+        yield n, para
+
+
+def per_run_xml(doc, empty, walk):
+    """The previous detection: serialize each run's XML, then regex it."""
+    for para in empty:  # first pass: empty paragraphs that hold a picture
+        for run in para.runs:
+            if "pic:pic" in run.element.xml:
+                break
+    found = {}
+    for n, para in walk:
+        if n < 0 or n in found:
+            continue
+        for run in para.runs:
+            if "pic:pic" in run.element.xml:
+                rids = re.findall(r'r:embed="([^"]+)"', run.element.xml)
+                if rids and rids[0] in doc.part.related_parts:
+                    found[n] = rids[0]
+                    break
+    return found
+
+
+def indexed(doc, empty, walk):
+    index = importer.index_images(doc)
+    for para in empty:
+        para._p in index
+    found = {}
+    for n, para in walk:
+        if n < 0 or n in found:
+            continue
+        for rid in index.get(para._p, ()):
+            if rid in doc.part.related_parts:
+                found[n] = rid
+                break
+    return found
+
+
+def _best(fn, args, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=100, help="days of 4 meals (100 is about 200 pages)")
+    parser.add_argument("--photo-every", type=int, default=1, help="a photo on every Nth recipe (0 = none)")
+    parser.add_argument("--runs", type=int, default=4, help="runs per line of text")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs (best is reported)")
+    opts = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-docx-"), "plan.docx")
+    build_document(path, opts.days, opts.photo_every, opts.runs)
+    doc = Document(path)
+    print(f"{path}: {len(doc.paragraphs)} paragraphs, {len(doc.inline_shapes)} pictures, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB")
+
+    # Walk the paragraphs once up front: only the image detection is timed
+    empty = [para for para in doc.paragraphs if not para.text.strip()]
+    walk = list(_recipe_paragraphs(doc))
+    old_t, old = _best(per_run_xml, (doc, empty, walk), opts.repeat)
+    new_t, new = _best(indexed, (doc, empty, walk), opts.repeat)
+    if old != new:
+        sys.exit(f"MISMATCH: per-run xml found {len(old)} images, index found {len(new)}")
+    image_dir = os.path.dirname(path)
+    parse_t, recipes = _best(lambda: list(importer.parse_recipes_from_docx(path, image_dir)), (), opts.repeat)
+    print(f"per-run xml  {old_t * 1000:8.1f} ms")
+    print(f"index        {new_t * 1000:8.1f} ms  ({old_t / new_t:.1f}x), {len(new)} recipe images, same picks")
+    print(f"full parse   {parse_t * 1000:8.1f} ms  ({len(recipes)} recipes, with the index)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Ingredient normalization: inline re.sub passes vs recipe_ingredients.
+
+Builds a corpus of --lines ingredient lines drawn, with a skewed
+distribution, from --distinct different lines (meal plans repeat the same
+"2 јајца" hundreds of times), then times deriving the item name for each:
+
+  re.sub x3     the previous importer code: three uncompiled re.sub passes
+                per line (re's internal pattern cache lookup every call)
+  compiled      parse_ingredient() without its LRU cache
+  memoized      parse_ingredient() with the cache, starting cold
+
+Item names must match the previous code except for en-dash ranges
+("1–2 лажици мед"), which it left as "–2 лажици мед"; those are counted.
+
+Usage:
+    python3 scripts/bench/bench_ingredients.py [--lines 100000] [--distinct 2000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SCRIPTS)
+from recipe_ingredients import parse_ingredient  # noqa: E402
+
+FOODS = ("јајца", "овесни снегулки", "млеко", "пилешко филе", "ориз", "домати", "сирење", "мед",
+         "маслиново масло", "банана", "ореви", "грчки јогурт", "тиквички", "леб од ‘рж", "Протеин")
+UNITS = ("гр", "г", "кг", "мл", "ml", "лажица", "лажици", "чаша", "канче", "", "")
+
+
+def _line(rng):
+    food = rng.choice(FOODS)
+    unit = rng.choice(UNITS)
+    amount = rng.choice((str(rng.randint(1, 300)), f"{rng.randint(1, 3)}-{rng.randint(2, 4)}",
+                         f"{rng.randint(1, 3)}–{rng.randint(2, 4)}", "1/2", "0,5", ""))
+    return " ".join(part for part in (amount, unit, food) if part)
+
+
+def build_corpus(lines, distinct, seed=42):
+    rng = random.Random(seed)
+    vocabulary = list(dict.fromkeys(_line(rng) for _ in range(distinct * 3)))[:distinct]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]  # Zipf-like
+    return rng.choices(vocabulary, weights, k=lines)
+
+
+def resub(ing):
+    """The item name as the importers derived it before recipe_ingredients."""
+    item_name = re.sub(r'^[\d\s\.\,\-/]+', '', ing)
+    item_name = re.sub(r'^\d+[\-–/]\d+\s*', '', item_name)
+    item_name = re.sub(r'^(г|гр|кг|мл|ml|l|лажица|лажици|чаша|канче|пола|малку|малу)\s+', '', item_name,
+                       flags=re.IGNORECASE)
+    item_name = item_name.strip()
+    if len(item_name) < 2:
+        item_name = ing
+    return item_name
+
+
+def compiled(ing):
+    return parse_ingredient.__wrapped__(ing).item
+
+
+def memoized(ing):
+    return parse_ingredient(ing).item
+
+
+def _best(fn, corpus, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        parse_ingredient.cache_clear()
+        t = time.perf_counter()
+        result = [fn(ing) for ing in corpus]
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="ingredient lines in the corpus")
+    parser.add_argument("--distinct", type=int, default=2000, help="different lines among them")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs (best is reported)")
+    opts = parser.parse_args()
+
+    corpus = build_corpus(opts.lines, opts.distinct)
+    print(f"{len(corpus)} lines, {len(set(corpus))} distinct")
+    base_t, base = _best(resub, corpus, opts.repeat)
+    print(f"re.sub x3   {base_t * 1000:8.1f} ms  {len(corpus) / base_t:12,.0f} ingredients/s")
+    for name, fn in (("compiled", compiled), ("memoized", memoized)):
+        t, items = _best(fn, corpus, opts.repeat)
+        differ = {ing for ing, old, new in zip(corpus, base, items) if old != new}
+        unexpected = [ing for ing in differ if "–" not in ing]
+        if unexpected:
+            sys.exit(f"MISMATCH: {name} differs from re.sub on {unexpected[:3]}")
+        print(f"{name:<11} {t * 1000:8.1f} ms  {len(corpus) / t:12,.0f} ingredients/s  ({base_t / t:.1f}x)"
+              f"  {len(differ)} distinct en-dash ranges now stripped")
+    info = parse_ingredient.cache_info()
+    print(f"LRU: {info.hits} hits, {info.misses} misses, maxsize {info.maxsize}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Recipe line classification: per-pattern checks vs classify_line().
+
+Builds --lines recipe lines (ingredients, instruction steps, section
+headers, calorie values and some edge cases) drawn with a skewed
+distribution from --distinct different lines, then times classifying each:
+
+  per-pattern   the previous code: the parser's header/calorie patterns and
+                inline re.match/re.search instruction heuristic, then
+                import_from_json.py's 29 substring scans for prep steps
+  combined      classify_line() without its LRU cache: one anchored match
+                for headers, numbers and verbs, then prefix-tree (trie)
+                regexes for units and prep words, each compiled once
+  memoized      classify_line() with the cache, starting cold
+
+Every line must get the same parser decision (section header, calorie
+values, instruction or not) as before. import_from_json.py now also drops
+instruction, header and calorie lines without a prep word; those are counted.
+
+Usage:
+    python3 scripts/bench/bench_line_classifier.py [--lines 100000] [--distinct 3000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SCRIPTS)
+import recipe_ingredients  # noqa: E402
+from recipe_ingredients import classify_line  # noqa: E402
+
+FOODS = ("јајца", "овесни снегулки", "млеко", "пилешко филе", "ориз", "домати", "сирење", "мед")
+STEPS = ("Измешајте ги сите состојки во сад.", "Печете 20 минути на 180 степени.",
+         "Ставете ја смесата во тава и пржете 5 минути.", "Сервирајте топло.",
+         "Додадете 200 гр јогурт и измешајте.", "Оставете да отстои 10 минути, па сервирајте.",
+         "Подгответе го филето, посолете и поперете.")
+HEADERS = ("Состојки", "Начин на припрема", "Калориска вредност", "Подготовка:", "Ingredients")
+EDGE = ("За сосот:", "Зачини: сол, бибер", "2 лажици маслиново масло, загреано на оган",
+        "Варено јајце", "1) Исецкајте ги доматите", "Калории ВЕГЕ: 320kcal | Протеини: 20g",
+        "Сварете 100 гр ориз", "– 50 гр сирење")
+
+
+def _line(rng):
+    roll = rng.random()
+    if roll < 0.55:
+        return f"{rng.randint(1, 300)} {rng.choice(('гр', 'мл', 'лажица', ''))} {rng.choice(FOODS)}".replace("  ", " ")
+    if roll < 0.75:
+        step = rng.choice(STEPS)
+        return f"{rng.randint(1, 6)}. {step}" if rng.random() < 0.5 else step
+    if roll < 0.82:
+        return " ".join(rng.choice(STEPS) for _ in range(4))  # a long paragraph
+    if roll < 0.9:
+        return rng.choice(HEADERS)
+    if roll < 0.95:
+        return f"Калории: {rng.randint(200, 600)}kcal | Протеини: {rng.randint(10, 40)}g"
+    return rng.choice(EDGE)
+
+
+def build_corpus(lines, distinct, seed=42):
+    rng = random.Random(seed)
+    vocabulary = list(dict.fromkeys(_line(rng) for _ in range(distinct * 3)))[:distinct]
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(len(vocabulary))]
+    return rng.choices(vocabulary, weights, k=lines)
+
+
+ingredients_pattern = re.compile(r'^(Состојки|Ингредиенти|Ingredients)', re.IGNORECASE)
+instructions_pattern = re.compile(r'^(Начин на припрема|Приготовка|Подготовка|Instructions)', re.IGNORECASE)
+calories_header_pattern = re.compile(r'^Калориска вредност\s*$', re.IGNORECASE)
+calories_value_pattern = re.compile(r'^Калории(\s+ВЕГЕ)?\s*:', re.IGNORECASE)
+
+
+def per_pattern(line):
+    """(parser decision, import_from_json skips it) as the previous code made them."""
+    if ingredients_pattern.match(line):
+        decision = 'ingredients'
+    elif instructions_pattern.match(line):
+        decision = 'instructions'
+    elif calories_header_pattern.match(line):
+        decision = 'calories'
+    elif calories_value_pattern.match(line):
+        decision = 'calorie values'
+    else:
+        is_probably_instruction = (
+            re.match(r'^\d+[\.\)]\s', line) or
+            (len(line) > 100 and not line.startswith(('–', '-', '*', '•'))) or
+            re.match(r'^(Печете|Ставете|Измешајте|Додадете|Пржете|Варете|Сварете|Исецкајте|Изблендирајте|Подгответе|Сервирајте)', line, re.IGNORECASE)
+        )
+        if is_probably_instruction and re.search(r'\b(гр|гр\.|кг|лажици|лажица|мл|ml|kcal|калории)\b', line, re.IGNORECASE):
+            is_probably_instruction = False
+        decision = 'instruction' if is_probably_instruction else 'other'
+
+    prep_indicators = ['измешајте', 'мешајте', 'ставете', 'додајте', 'наредете', 'поделете',
+        'сервирајте', 'оставете', 'печете', 'варете', 'пржете', 'загрејте',
+        'исечете', 'сечете', 'излупете', 'исчистете', 'измијте',
+        'во сад', 'во тава', 'во чинија', 'во рерна', 'на оган',
+        'подготовка', 'припрема', 'приготви', 'минути', 'часа', 'секунди']
+    ing_lower = line.lower()
+    skipped = (any(p in ing_lower for p in prep_indicators) or len(line) > 100
+               or (line.endswith(':') and len(line) < 50))
+    return decision, skipped
+
+
+def _decision(kind):
+    if kind in recipe_ingredients.HEADER_SECTIONS:
+        return recipe_ingredients.HEADER_SECTIONS[kind]
+    return {recipe_ingredients.CALORIES: 'calorie values',
+            recipe_ingredients.INSTRUCTION: 'instruction'}.get(kind, 'other')
+
+
+def combined(line):
+    kind = classify_line.__wrapped__(line)
+    return _decision(kind), kind != recipe_ingredients.INGREDIENT
+
+
+def memoized(line):
+    kind = classify_line(line)
+    return _decision(kind), kind != recipe_ingredients.INGREDIENT
+
+
+def _best(fn, corpus, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        classify_line.cache_clear()
+        t = time.perf_counter()
+        result = [fn(line) for line in corpus]
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="recipe lines in the corpus")
+    parser.add_argument("--distinct", type=int, default=3000, help="different lines among them")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs (best is reported)")
+    opts = parser.parse_args()
+
+    corpus = build_corpus(opts.lines, opts.distinct)
+    print(f"{len(corpus)} lines, {len(set(corpus))} distinct")
+    base_t, base = _best(per_pattern, corpus, opts.repeat)
+    print(f"per-pattern {base_t * 1000:8.1f} ms  {len(corpus) / base_t:12,.0f} lines/s")
+    for name, fn in (("combined", combined), ("memoized", memoized)):
+        t, results = _best(fn, corpus, opts.repeat)
+        mismatch = [line for line, old, new in zip(corpus, base, results) if old[0] != new[0]]
+        if mismatch:
+            sys.exit(f"MISMATCH: {name} parser decision differs on {mismatch[:3]}")
+        lost = [line for line, old, new in zip(corpus, base, results) if old[1] and not new[1]]
+        if lost:
+            sys.exit(f"MISMATCH: {name} keeps lines the JSON import skipped: {lost[:3]}")
+        dropped = {line for line, old, new in zip(corpus, base, results) if new[1] and not old[1]}
+        print(f"{name:<11} {t * 1000:8.1f} ms  {len(corpus) / t:12,.0f} lines/s  ({base_t / t:.1f}x)"
+              f"  {len(dropped)} distinct non-ingredient lines now skipped by the JSON import")
+
+
+if __name__ == "__main__":
+    main()
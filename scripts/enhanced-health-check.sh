@@ -596,7 +596,13 @@ if ! check_service_http "http://localhost:5000/" 5; then
     PORT_USER=$(sudo lsof -t -i:5000 -sTCP:LISTEN 2>/dev/null)
     BOOKMARKS_PID=$(systemctl show -p MainPID bookmarks.service | cut -d= -f2)
 
-    if [ -n "$PORT_USER" ] && [ "$PORT_USER" != "$BOOKMARKS_PID" ] && [ "$BOOKMARKS_PID" != "0" ]; then
+    if systemctl is-active --quiet bookmarks.socket; then
+        # systemd (PID 1) holds port 5000 for the service: never kill the holder
+        if ! systemctl is-active --quiet bookmarks.service; then
+            log "WARNING: Bookmarks service stopped (socket still listening). Restarting..."
+            sudo systemctl restart bookmarks.service
+        fi
+    elif [ -n "$PORT_USER" ] && [ "$PORT_USER" != "$BOOKMARKS_PID" ] && [ "$BOOKMARKS_PID" != "0" ]; then
         PROCESS_NAME=$(ps -p $PORT_USER -o comm=)
         log "CRITICAL: Port 5000 conflict denied! Used by PID $PORT_USER ($PROCESS_NAME). Killing..."
         sudo kill -9 $PORT_USER
@@ -21,9 +21,15 @@ done
 # Check Bookmarks specifically for port 5000 conflict
 if ! check_service_http "http://localhost:5000/" 5; then
     log "WARNING: Bookmarks service not answering on port 5000"
-    
+
+    # With bookmarks.socket, systemd itself holds port 5000 across restarts
+    if systemctl is-active --quiet bookmarks.socket; then
+        if ! systemctl is-active --quiet bookmarks.service; then
+            log "WARNING: Bookmarks service stopped (socket still listening). Restarting..."
+            sudo systemctl restart bookmarks.service
+        fi
     # Check if port 5000 is occupied by something else (e.g. AirPlay on macOS, though less likely on Linux)
-    if ss -tuln | grep -q ":5000 "; then
+    elif ss -tuln | grep -q ":5000 "; then
         log "ERROR: Port 5000 is occupied by another process"
     elif ! systemctl is-active --quiet bookmarks.service; then
          log "WARNING: Bookmarks service stopped. Restarting..."
@@ -14,123 +14,167 @@ Format expected:
 Usage:
     # Parse and output JSON (dry run)
     python3 import-recipes-to-kitchenowl.py /path/to/recipes.docx --dry-run
-    
+
     # Import to KitchenOwl (must run inside container or with DB access)
     python3 import-recipes-to-kitchenowl.py /path/to/recipes.docx
+
+    # Parse a folder (or several files) on 4 cores
+    python3 import-recipes-to-kitchenowl.py /path/to/folder --jobs 4
+
+    # Show what an import would insert, update or skip, without writing
+    python3 import-recipes-to-kitchenowl.py /path/to/folder --plan [--update]
 """
 
+import argparse
+import contextlib
+import gc
+import hashlib
+import io
 import os
+import shutil
 import sys
 import json
 import re
+import tempfile
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
 try:
     from docx import Document
+    from docx.text.paragraph import Paragraph
 except ImportError:
     print("ERROR: python-docx not installed. Install with: pip install python-docx")
     sys.exit(1)
 
+from kitchenowl_db import DEFAULT_BATCH, ImportDatabase, ImportPlan, linked_lines, recipe_fingerprint
+import recipe_ingredients
+from recipe_ingredients import CALORIES, HEADER_SECTIONS, INSTRUCTION, classify_line, parse_ingredient
+
+# Bump whenever parse_recipes_from_docx() output changes: cached parses of
+# older versions are then ignored (changes to recipe_ingredients.py are
+# picked up by the cache key on their own)
+PARSER_VERSION = 1
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "kitchenowl-import"
+
+
+def index_images(doc):
+    """
+    Map each body paragraph element (w:p) to the relationship ids of the
+    pictures in its runs, in run order (first r:embed of each run).
+
+    One XPath query over the document body replaces serializing every run's
+    XML to look for 'pic:pic'; the image bytes are not touched here.
+    """
+    index = {}
+    for run in doc.element.body.xpath('./w:p/w:r[.//pic:pic]'):
+        rids = run.xpath('.//@r:embed')
+        if rids:
+            index.setdefault(run.getparent(), []).append(rids[0])
+    return index
+
+
+def iter_lines(doc, image_index):
+    """
+    Yield (line, paragraph) for every non-empty line of the document body,
+    and ('', paragraph) for empty paragraphs that hold a picture.
+    """
+    for block in doc.iter_inner_content():
+        if not isinstance(block, Paragraph):
+            continue  # tables were never part of doc.paragraphs either
+        text = block.text.strip()
+        if text:
+            # Split paragraphs by internal newlines to get individual lines
+            for line in text.split('\n'):
+                line = line.strip()
+                if line:
+                    yield line, block
+        elif block._p in image_index:
+            # Keep empty paragraphs if they might contain images
+            yield '', block
+
+
+def save_image(recipe, image_dir):
+    """Write a finished recipe's image to image_dir; image_data keeps the path."""
+    image = recipe['image_data']
+    if image and 'part' in image:
+        blob = image.pop('part').blob
+        image['path'] = os.path.join(image_dir, f"{uuid.uuid4().hex}.{image['ext']}")
+        image['size_bytes'] = len(blob)
+        with open(image['path'], 'wb') as f:
+            f.write(blob)
+    return recipe
+
 
-def parse_recipes_from_docx(doc_path):
+def parse_recipes_from_docx(doc_path, image_dir):
     """
-    Parse multiple recipes from a Word document.
-    
-    Returns list of recipe dicts with:
+    Parse multiple recipes from a Word document, yielding each recipe as
+    soon as it is complete, so memory holds one recipe at a time.
+
+    Yields recipe dicts with:
     - name: Recipe name
     - meal_type: ПОЈАДОК, РУЧЕК, ВЕЧЕРА, УЖИНА, etc.
     - workout_tag: Workout name from day marker
     - ingredients: List of ingredient strings
     - instructions: Preparation instructions
     - calories_info: Calorie/macro information
-    - image_data: Dict with 'blob' and 'ext' if found
+    - image_data: Dict with 'path' (written to image_dir when the recipe is
+      yielded), 'ext' and 'size_bytes' if found
+
+    A document python-docx cannot read raises, so the caller reports it
+    (and the parse cache does not store it).
     """
-    try:
-        doc = Document(doc_path)
-    except Exception as e:
-        print(f"ERROR: Could not read {doc_path}: {e}")
-        return []
-
-    # Split paragraphs by internal newlines to get individual lines
-    lines = []
-    # We'll store paragraphs with their raw objects to find images later
-    parsed_elements = []
-    
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if text:
-            for line in text.split('\n'):
-                line = line.strip()
-                if line:
-                    lines.append(line)
-                    parsed_elements.append({'text': line, 'para': para})
-        else:
-            # Keep empty paragraphs if they might contain images
-            has_image = False
-            for run in para.runs:
-                if 'pic:pic' in run.element.xml:
-                    has_image = True
-                    break
-            if has_image:
-                parsed_elements.append({'text': '', 'para': para})
-    
-    if not parsed_elements:
-        return []
+    doc = Document(doc_path)
+
+    image_index = index_images(doc)
 
-    recipes = []
     current_recipe = None
     current_workout = None
     current_section = None  # 'ingredients', 'instructions', 'calories'
-    
+
     # Simple snacks to skip (single fruit/food items that don't need a recipe)
     SKIP_SNACKS = {
         'банана', 'јаболко', 'портокал', 'мандарина', 'грозје', 'киви',
         'круша', 'праска', 'кајсија', 'слива', 'диња', 'лубеница',
         'јапонско јаболко', 'нар', 'смоква', 'боровинки', 'малини',
         'јагоди', 'цреши', 'вишни', 'ананас', '2 киви', '1 јаболко',
-        '1 банана', '2 банани', 'протеинско пудингче', 
+        '1 банана', '2 банани', 'протеинско пудингче',
         'протеинско пудингче или ред црно чоколадо',
     }
-    
+
     # Patterns
     day_pattern = re.compile(r'^Ден\s*\d+\s*:\s*\|([^|]+)\|', re.IGNORECASE)
     meal_pattern = re.compile(r'^(ПОЈАДОК|РУЧЕК|ВЕЧЕРА|УЖИНА|ДЕСЕРТ|СНЕК)\s*:\s*(.+)$', re.IGNORECASE)
-    ingredients_pattern = re.compile(r'^(Состојки|Ингредиенти|Ingredients)', re.IGNORECASE)
-    instructions_pattern = re.compile(r'^(Начин на припрема|Приготовка|Подготовка|Instructions)', re.IGNORECASE)
-    # Only match the header, not the actual calorie values line
-    calories_header_pattern = re.compile(r'^Калориска вредност\s*$', re.IGNORECASE)
-    # Match both regular and ВЕГЕ (vegan) calorie lines
-    calories_value_pattern = re.compile(r'^Калории(\s+ВЕГЕ)?\s*:', re.IGNORECASE)
-    
-    for elem in parsed_elements:
-        line = elem['text']
-        para = elem['para']
-        
+    spices_pattern = re.compile(r'Зачини\s*:', re.IGNORECASE)
+    # Section headers, calorie values and instruction-like lines are told
+    # apart by classify_line() (recipe_ingredients.py)
+
+    for line, para in iter_lines(doc, image_index):
+
         # Check for day marker with workout
         day_match = day_pattern.match(line)
         if day_match:
             current_workout = day_match.group(1).strip()
             continue
-        
+
         # Check for meal type + recipe name
         meal_match = meal_pattern.match(line)
         if meal_match:
             # Save previous recipe if exists
             if current_recipe and current_recipe['name']:
-                recipes.append(current_recipe)
-            
+                yield save_image(current_recipe, image_dir)
+
             meal_type = meal_match.group(1).upper()
             recipe_name = meal_match.group(2).strip()
-            
+
             # Skip simple snacks (single fruit/food items)
             if recipe_name.lower() in SKIP_SNACKS:
                 print(f"  ⏭️  Skipping simple snack: {recipe_name}")
                 current_recipe = None
                 current_section = None
                 continue
-            
+
             current_recipe = {
                 'name': recipe_name,
                 'meal_type': meal_type,
@@ -144,41 +188,31 @@ def parse_recipes_from_docx(doc_path):
             continue
 
         # --- Image Detection ---
-        # Look for images in the current paragraph
+        # Look for images in the current paragraph (written out by save_image())
         if current_recipe and not current_recipe['image_data']:
-            for run in para.runs:
-                if 'pic:pic' in run.element.xml:
-                    rIds = re.findall(r'r:embed="([^"]+)"', run.element.xml)
-                    if rIds:
-                        rId = rIds[0]
-                        try:
-                            image_part = doc.part.related_parts[rId]
-                            current_recipe['image_data'] = {
-                                'blob': image_part.blob,
-                                'ext': image_part.content_type.split('/')[-1]
-                            }
-                            break # Only one image per recipe for now
-                        except KeyError:
-                            pass
-        
+            for rId in image_index.get(para._p, ()):
+                try:
+                    image_part = doc.part.related_parts[rId]
+                except KeyError:
+                    continue
+                current_recipe['image_data'] = {
+                    'part': image_part,
+                    'ext': image_part.content_type.split('/')[-1]
+                }
+                break # Only one image per recipe for now
+
         if not line: # Empty paragraph used only for image check
             continue
-        
+
+        kind = classify_line(line)
+
         # Check for section headers
-        if ingredients_pattern.match(line):
-            current_section = 'ingredients'
+        if kind in HEADER_SECTIONS:
+            current_section = HEADER_SECTIONS[kind]
             continue
-        
-        if instructions_pattern.match(line):
-            current_section = 'instructions'
-            continue
-        
-        if calories_header_pattern.match(line):
-            current_section = 'calories'
-            continue
-        
-        # If we see "Калории:" line, capture it directly as calorie info
-        if calories_value_pattern.match(line):
+
+        # If we see "Калории:" line (or "Калории ВЕГЕ:"), capture it directly as calorie info
+        if kind == CALORIES:
             if current_recipe:
                 # Append to existing calorie info (for ВЕГЕ variants)
                 if current_recipe.get('calories_info'):
@@ -186,263 +220,375 @@ def parse_recipes_from_docx(doc_path):
                 else:
                     current_recipe['calories_info'] = line
             continue
-        
+
         # Process content based on current section
         if current_recipe:
             clean_line = line.strip()
-            
+
             # --- Fallback Heuristic: Auto-switch to instructions ---
-            # If we are in 'ingredients' (or no section) and see something that looks like instructions:
-            is_probably_instruction = (
-                # Starts with a number followed by . or ) e.g. "1. ", "1) "
-                # (Avoiding "150 gr" which is an ingredient)
-                re.match(r'^\d+[\.\)]\s', clean_line) or
-                # Very long line (>100 chars) without bullet points
-                (len(clean_line) > 100 and not clean_line.startswith(('–', '-', '*', '•'))) or
-                # Contains specific instruction verbs at the start
-                re.match(r'^(Печете|Ставете|Измешајте|Додадете|Пржете|Варете|Сварете|Исецкајте|Изблендирајте|Подгответе|Сервирајте)', clean_line, re.IGNORECASE)
-            )
-            
-            # Additional check: If it contains measure units, it's NOT an instruction
-            if is_probably_instruction and re.search(r'\b(гр|гр\.|кг|лажици|лажица|мл|ml|kcal|калории)\b', clean_line, re.IGNORECASE):
-                is_probably_instruction = False
-            
+            # If we are in 'ingredients' (or no section) and see something that looks like
+            # instructions: a numbered step ("1. ", not "150 gr"), an instruction verb or a
+            # long line without a bullet, and no measure units
+            is_probably_instruction = kind == INSTRUCTION
+
             if current_section != 'instructions' and current_section != 'calories' and is_probably_instruction:
                 # If we were in ingredients, switch to instructions
                 current_section = 'instructions'
-            
+
             if current_section == 'ingredients':
                 ingredient = clean_line
                 # Remove bullet point
                 if ingredient.startswith(('–', '-', '*', '•')):
                     ingredient = ingredient[1:].strip()
-                
-                # Check if this line is actually a section header that we missed 
+
+                # Check if this line is actually a section header that we missed
                 # (sometimes they are bulleted or slightly different)
-                if ingredients_pattern.match(ingredient) or instructions_pattern.match(ingredient) or calories_header_pattern.match(ingredient):
+                if classify_line(ingredient) in HEADER_SECTIONS:
                     continue
-                
+
                 # Check if this is a "Зачини:" (spices) line - move to instructions instead
-                if ingredient and re.search(r'Зачини\s*:', ingredient, re.IGNORECASE):
+                if ingredient and spices_pattern.search(ingredient):
                     # Add spices to instructions/description, not ingredients
                     if 'spices_info' not in current_recipe:
                         current_recipe['spices_info'] = ''
                     current_recipe['spices_info'] = ingredient
                 elif ingredient and len(ingredient) > 1:
                     current_recipe['ingredients'].append(ingredient)
-            
+
             elif current_section == 'instructions':
                 if current_recipe['instructions']:
                     current_recipe['instructions'] += '\n' + line
                 else:
                     current_recipe['instructions'] = line
-            
+
             elif current_section == 'calories':
                 # Calorie line - save and end recipe
                 current_recipe['calories_info'] = line
                 if current_recipe['name']:
-                    recipes.append(current_recipe)
+                    yield save_image(current_recipe, image_dir)
                 current_recipe = None
                 current_section = None
-    
+
     # Don't forget the last recipe if not ended with calories
     if current_recipe and current_recipe['name']:
-        recipes.append(current_recipe)
-    
-    return recipes
+        yield save_image(current_recipe, image_dir)
 
 
-def main():
-    if len(sys.argv) < 2:
-        print(__doc__)
-        sys.exit(1)
-    
-    input_path = Path(sys.argv[1])
-    dry_run = '--dry-run' in sys.argv
-    update_mode = '--update' in sys.argv
-    
-    if not input_path.exists():
-        print(f"ERROR: Path does not exist: {input_path}")
-        sys.exit(1)
-    
-    # Find Word documents
-    if input_path.is_file():
-        doc_files = [input_path]
-    else:
-        doc_files = list(input_path.glob("*.docx")) + list(input_path.glob("*.doc"))
-    
-    if not doc_files:
-        print(f"ERROR: No Word documents found in {input_path}")
-        sys.exit(1)
-    
-    print(f"Found {len(doc_files)} Word document(s)")
-    
-    all_recipes = []
-    
-    for doc_file in doc_files:
-        print(f"\n{'='*50}")
-        print(f"Processing: {doc_file.name}")
-        print('='*50)
-        
-        recipes = parse_recipes_from_docx(doc_file)
-        
-        if not recipes:
-            print("  No recipes found")
-            continue
-        
-        print(f"  Found {len(recipes)} recipe(s)")
-        
-        for r in recipes:
-            print(f"    - {r['name']} ({r.get('meal_type', 'N/A')}, {len(r['ingredients'])} ing)")
-        
-        all_recipes.extend(recipes)
-    
-    print(f"\n{'='*50}")
-    print(f"Total: {len(all_recipes)} recipes parsed")
-    print('='*50)
-    
-    if dry_run:
-        # Output JSON (remove raw blobs as they are not serializable)
-        dry_run_data = []
-        for r in all_recipes:
-            r_copy = r.copy()
-            if r_copy.get('image_data'):
-                r_copy['image_data'] = {
-                    'size_bytes': len(r_copy['image_data']['blob']),
-                    'ext': r_copy['image_data']['ext']
-                }
-            dry_run_data.append(r_copy)
-            
-        output_file = '/tmp/parsed_recipes.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(dry_run_data, f, ensure_ascii=False, indent=2)
-        print(f"\nDry run - saved to {output_file}")
-        print("To import, copy to container and run import script:")
-        print("  docker cp /tmp/parsed_recipes.json kitchenowl:/data/")
-        print("  docker exec kitchenowl python3 /data/import_script.py")
+def remove_images(recipes):
+    """Delete the image files written for recipes (of a document that failed to parse)."""
+    for recipe in recipes:
+        if recipe.get('image_data'):
+            with contextlib.suppress(OSError):
+                os.remove(recipe['image_data']['path'])
+
+
+def parse_document(doc_file, staging_dir):
+    """
+    Parse one document in a pool worker (--jobs).
+
+    Images are written to staging_dir by the parser instead of being pickled
+    back to the parent. Returns (recipes, output): the parser's messages are
+    captured so they can be printed in document order.
+    """
+    output = io.StringIO()
+    recipes = []
+    with contextlib.redirect_stdout(output):
+        try:
+            recipes.extend(parse_recipes_from_docx(doc_file, staging_dir))
+        except Exception:
+            remove_images(recipes)
+            raise
+    gc.collect()  # the parsed document is cyclic garbage; free it before the next one
+    return recipes, output.getvalue()
+
+
+class ParseCache:
+    """
+    Parsed recipes per document, keyed by the file's SHA-256, PARSER_VERSION
+    and a hash of recipe_ingredients.py (whose line classification and
+    ingredient parsing the output depends on), so unchanged documents are
+    not parsed again.
+
+    Entries are JSON; recipe images live in images/ next to them and the
+    entries reference them by path (a hit needs its images to still exist).
+    Documents that fail to parse are not stored. sources.json maps each
+    document path to its entry: storing a new entry for a path removes the
+    one it replaces, with its images. Nothing is created on disk until a
+    miss is parsed, so --plan runs over cached documents leave no trace.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root if root is not None else CACHE_DIR)
+        self.images = self.root / 'images'
+        self.version = f"v{PARSER_VERSION}-{self._file_digest(recipe_ingredients.__file__)[:12]}"
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _file_digest(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key(self, doc_file):
+        return f"{self._file_digest(doc_file)}-{self.version}"
+
+    def load(self, key):
+        """The cached recipes for key, or None (counted as a miss)."""
+        try:
+            with open(self.root / f"{key}.json", encoding='utf-8') as f:
+                recipes = json.load(f)['recipes']
+        except (OSError, ValueError, KeyError):
+            recipes = None
+        if recipes is not None and all(
+                os.path.exists(r['image_data']['path']) for r in recipes if r.get('image_data')):
+            self.hits += 1
+            return recipes
+        self.misses += 1
+        return None
+
+    def image_dir(self):
+        """images/, created on first use: parsed misses write their images there."""
+        self.images.mkdir(parents=True, exist_ok=True)
+        return str(self.images)
+
+    def _write_json(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def store(self, key, doc_file, recipes):
+        source = str(Path(doc_file).resolve())
+        self._write_json(self.root / f"{key}.json", {'source': source, 'recipes': recipes})
+        index_path = self.root / 'sources.json'
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        old_key = index.get(source)
+        index[source] = key
+        self._write_json(index_path, index)
+        # Another path may hold the same document; keep its entry
+        if old_key and old_key != key and old_key not in index.values():
+            self._remove(old_key)
+
+    def _remove(self, key):
+        path = self.root / f"{key}.json"
+        try:
+            with open(path, encoding='utf-8') as f:
+                remove_images(json.load(f)['recipes'])
+        except (OSError, ValueError, KeyError):
+            pass
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+    def storing(self, key, doc_file, recipes):
+        """Pass a recipe stream through, caching it once it is complete."""
+        done = []
+        try:
+            for recipe in recipes:
+                done.append(recipe)
+                yield recipe
+        except Exception:
+            remove_images(done)
+            raise
+        self.store(key, doc_file, done)
+
+
+def parse_documents(doc_files, jobs, staging_dir, cache=None):
+    """
+    Yield (doc_file, recipes, output, error, cached) for each document, in order.
+
+    Serially, `recipes` is the parser's generator itself (its messages print
+    as it goes, and errors surface while iterating); with jobs > 1 it is the
+    list a worker returned. Cache hits are never parsed; misses are parsed
+    with their images written into the cache, and stored once complete.
+    """
+    keys = [cache.key(doc_file) if cache else None for doc_file in doc_files]
+    cached = [cache.load(key) if cache else None for key in keys]
+    image_dir = staging_dir
+    if cache and any(recipes is None for recipes in cached):
+        image_dir = cache.image_dir()
+
+    if jobs <= 1:
+        for doc_file, key, recipes in zip(doc_files, keys, cached):
+            if recipes is not None:
+                yield doc_file, recipes, '', None, True
+                continue
+            recipes = parse_recipes_from_docx(doc_file, image_dir)
+            if cache:
+                recipes = cache.storing(key, doc_file, recipes)
+            yield doc_file, recipes, '', None, False
         return
-    
-    # Import to database
-    try:
-        import sqlite3
-    except ImportError:
-        print("ERROR: sqlite3 not available")
-        sys.exit(1)
-    
-    DB_PATH = "/data/database.db"  # Inside container
-    if not os.path.exists(DB_PATH):
-        # Try host path
-        DB_PATH = "/mnt/ssd/docker-projects/kitchenowl/data/database.db"
-    
-    if not os.path.exists(DB_PATH):
-        print(f"ERROR: Database not found. Run inside container or use --dry-run")
-        sys.exit(1)
-    
-    # Image storage path
-    UPLOAD_PATH = "/data/upload"
-    if not os.path.exists(UPLOAD_PATH):
-        UPLOAD_PATH = "/mnt/ssd/docker-projects/kitchenowl/data/upload"
-    
-    if not os.path.exists(UPLOAD_PATH):
-        print(f"WARNING: Upload directory not found: {UPLOAD_PATH}. Images will not be saved.")
-        UPLOAD_PATH = None
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Get household ID
-    cursor.execute("SELECT id FROM household LIMIT 1")
-    result = cursor.fetchone()
-    if not result:
-        print("ERROR: No household found. Create one in KitchenOwl first.")
-        sys.exit(1)
-    
-    household_id = result[0]
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-    
-    def find_or_create_tag(name):
-        cursor.execute("SELECT id FROM tag WHERE household_id = ? AND LOWER(name) = LOWER(?)", 
-                       (household_id, name.strip()))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        cursor.execute("INSERT INTO tag (name, household_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                       (name.strip(), household_id, now, now))
-        conn.commit()
-        return cursor.lastrowid
-    
-    def find_or_create_item(name):
-        name = name.strip()
-        if not name or len(name) < 2:
-            return None
-        cursor.execute("SELECT id FROM item WHERE household_id = ? AND LOWER(name) = LOWER(?)", 
-                       (household_id, name))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        cursor.execute("INSERT INTO item (name, household_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                       (name, household_id, now, now))
-        conn.commit()
-        return cursor.lastrowid
-    
-    imported = 0
-    skipped = 0
-    
-    for recipe in all_recipes:
-        # Check if exists
-        cursor.execute("SELECT id FROM recipe WHERE household_id = ? AND name = ?",
-                       (household_id, recipe['name']))
-        existing = cursor.fetchone()
-        
-        if existing:
-            if update_mode:
-                print(f"  🔄 Updating: {recipe['name']}")
-                # Delete existing recipe tags and items first to avoid orphaned records
-                recipe_id = existing[0]
-                cursor.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
-                cursor.execute("DELETE FROM recipe_items WHERE recipe_id = ?", (recipe_id,))
-                cursor.execute("DELETE FROM recipe WHERE id = ?", (recipe_id,))
-                # Fall through to insert new version
-            else:
-                print(f"  Skip (exists): {recipe['name']}")
-                skipped += 1
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [None if recipes is not None else pool.submit(parse_document, doc_file, image_dir)
+                   for doc_file, recipes in zip(doc_files, cached)]
+        for doc_file, key, recipes, future in zip(doc_files, keys, cached, futures):
+            if future is None:
+                yield doc_file, recipes, '', None, True
+                continue
+            try:
+                recipes, output = future.result()
+            except Exception as e:
+                yield doc_file, [], '', e, False
                 continue
-        
-        # Build description: instructions first, then spices, then calories at end
-        desc_parts = []
-        
-        # Add meal type and workout as tags at the top
-        tags_line = []
-        if recipe.get('meal_type'):
-            tags_line.append(f"[{recipe['meal_type']}]")
-        if recipe.get('workout_tag'):
-            tags_line.append(f"[{recipe['workout_tag']}]")
-        if tags_line:
-            desc_parts.append(' '.join(tags_line))
-        
-        # Add preparation instructions
-        if recipe.get('instructions'):
-            desc_parts.append(recipe['instructions'])
-        
-        # Add spices info (moved from ingredients)
-        if recipe.get('spices_info'):
-            desc_parts.append(f"\n{recipe['spices_info']}")
-        
-        # Add calories at the very end
-        if recipe.get('calories_info'):
-            desc_parts.append(f"\n\n📊 {recipe['calories_info']}")
-        
-        description = '\n\n'.join(desc_parts)
-        
+            if cache:
+                cache.store(key, doc_file, recipes)
+            yield doc_file, recipes, output, None, False
+
+
+class DryRunWriter:
+    """--dry-run: appends each recipe to a JSON array file as it arrives."""
+
+    def __init__(self, path='/tmp/parsed_recipes.json'):
+        self.path = path
+        self.count = 0
+        self.f = open(path, 'w', encoding='utf-8')
+        self.f.write('[')
+
+    def add(self, recipe):
+        # Staged image files are removed at exit, so keep only size/type
+        r_copy = recipe.copy()
+        if r_copy.get('image_data'):
+            r_copy['image_data'] = {
+                'size_bytes': r_copy['image_data']['size_bytes'],
+                'ext': r_copy['image_data']['ext']
+            }
+        self.f.write(',\n' if self.count else '\n')
+        json.dump(r_copy, self.f, ensure_ascii=False, indent=2)
+        self.count += 1
+
+    def close(self):
+        self.f.write('\n]\n')
+        self.f.close()
+        print(f"\nDry run - saved to {self.path}")
+        print("To import, copy to container and run import script:")
+        print("  docker cp /tmp/parsed_recipes.json kitchenowl:/data/")
+        print("  docker cp import_from_json.py kitchenowl:/data/")
+        print("  docker cp recipe_ingredients.py kitchenowl:/data/")
+        print("  docker cp kitchenowl_db.py kitchenowl:/data/")
+        print("  docker exec kitchenowl python3 /data/import_from_json.py")
+
+
+def build_description(recipe):
+    """Description: instructions first, then spices, then calories at end."""
+    desc_parts = []
+
+    # Add meal type and workout as tags at the top
+    tags_line = []
+    if recipe.get('meal_type'):
+        tags_line.append(f"[{recipe['meal_type']}]")
+    if recipe.get('workout_tag'):
+        tags_line.append(f"[{recipe['workout_tag']}]")
+    if tags_line:
+        desc_parts.append(' '.join(tags_line))
+
+    # Add preparation instructions
+    if recipe.get('instructions'):
+        desc_parts.append(recipe['instructions'])
+
+    # Add spices info (moved from ingredients)
+    if recipe.get('spices_info'):
+        desc_parts.append(f"\n{recipe['spices_info']}")
+
+    # Add calories at the very end
+    if recipe.get('calories_info'):
+        desc_parts.append(f"\n\n📊 {recipe['calories_info']}")
+
+    return '\n\n'.join(desc_parts)
+
+
+class RecipeImporter:
+    """
+    Writes each recipe into the KitchenOwl database as it arrives, as the
+    import plan (insert, update or skip) decides. With plan_only the plan is
+    printed and nothing is written.
+    """
+
+    def __init__(self, update_mode, batch=DEFAULT_BATCH, plan_only=False):
+        self.update_mode = update_mode
+        self.plan_only = plan_only
+        self.skipped = 0
+
+        DB_PATH = "/data/database.db"  # Inside container
+        if not os.path.exists(DB_PATH):
+            # Try host path
+            DB_PATH = "/mnt/ssd/docker-projects/kitchenowl/data/database.db"
+
+        if not os.path.exists(DB_PATH):
+            print(f"ERROR: Database not found. Run inside container or use --dry-run")
+            sys.exit(1)
+
+        # Image storage path
+        UPLOAD_PATH = "/data/upload"
+        if not os.path.exists(UPLOAD_PATH):
+            UPLOAD_PATH = "/mnt/ssd/docker-projects/kitchenowl/data/upload"
+
+        if not os.path.exists(UPLOAD_PATH):
+            print(f"WARNING: Upload directory not found: {UPLOAD_PATH}. Images will not be saved.")
+            UPLOAD_PATH = None
+        self.upload_path = UPLOAD_PATH
+
+        self.db = ImportDatabase(DB_PATH, batch, read_only=plan_only)
+        self.conn = self.db.conn
+        self.cursor = self.db.cursor
+
+        # Get household ID
+        self.cursor.execute("SELECT id FROM household LIMIT 1")
+        result = self.cursor.fetchone()
+        if not result:
+            print("ERROR: No household found. Create one in KitchenOwl first.")
+            sys.exit(1)
+
+        self.household_id = result[0]
+        self.now = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        # Existing recipes are loaded once; each arriving recipe is planned against them
+        self.plan = ImportPlan(self.cursor, self.household_id, update_mode)
+        if not plan_only:
+            self.db.load_names(self.household_id)
+
+    def add(self, recipe):
+        description = build_description(recipe)
+        items = [(parse_ingredient(ing).item, ing) for ing in recipe['ingredients']]
+        action = self.plan.classify(recipe['name'], recipe_fingerprint(description, linked_lines(items)))
+        if self.plan_only:
+            self.plan.show(action, recipe['name'])
+            return
+        if action == ImportPlan.SKIP:
+            print(f"  Skip (exists): {recipe['name']}")
+            self.skipped += 1
+            return
+        if action == ImportPlan.UNCHANGED:
+            print(f"  Unchanged: {recipe['name']}")
+            self.skipped += 1
+            return
+        replace_id = self.plan.ids.get(recipe['name']) if action == ImportPlan.UPDATE else None
+        # Written in the open chunk; a failure rolls the whole chunk back
+        with self.db.recipe(recipe['name']):
+            self._write(recipe, description, items, replace_id)
+
+    def _write(self, recipe, description, items, replace_id):
+        cursor, now, household_id = self.cursor, self.now, self.household_id
+        if replace_id is not None:
+            print(f"  🔄 Updating: {recipe['name']}")
+            # Delete existing recipe tags and items first to avoid orphaned records
+            self.db.delete_recipe(replace_id)
+
         # Insert recipe
         photo_filename = None
-        if recipe.get('image_data') and UPLOAD_PATH:
-            ext = recipe['image_data']['ext']
-            photo_filename = f"{uuid.uuid4().hex}.{ext}"
+        if recipe.get('image_data') and self.upload_path:
+            staged = recipe['image_data']['path']
+            photo_filename = f"{uuid.uuid4().hex}.{recipe['image_data']['ext']}"
             try:
-                with open(os.path.join(UPLOAD_PATH, photo_filename), 'wb') as f:
-                    f.write(recipe['image_data']['blob'])
-                
+                shutil.copyfile(staged, os.path.join(self.upload_path, photo_filename))
+                self.db.add_file(os.path.join(self.upload_path, photo_filename))
+
                 # Register in 'file' table so KitchenOwl serves it
                 cursor.execute("""
                     INSERT OR IGNORE INTO file (filename, created_at, updated_at, created_by)
@@ -458,44 +604,130 @@ def main():
                 suggestion_score, suggestion_rank)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (recipe['name'], description, photo_filename, now, now, household_id, 'PRIVATE', 0, 0, 0, 0))
-        
+
         recipe_id = cursor.lastrowid
-        
+        self.plan.ids[recipe['name']] = recipe_id
+
         # Add tags
         for tag_name in [recipe.get('workout_tag'), recipe.get('meal_type')]:
             if tag_name:
-                tag_id = find_or_create_tag(tag_name)
-                cursor.execute("INSERT INTO recipe_tags (recipe_id, tag_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                               (recipe_id, tag_id, now, now))
-        
+                self.db.add_recipe_tag(recipe_id, tag_name, now)
+
         # Add ingredients
-        for ing in recipe['ingredients']:
-            # Extract item name (remove quantities)
-            item_name = re.sub(r'^[\d\s\.\,\-/]+', '', ing)
-            item_name = re.sub(r'^\d+[\-–/]\d+\s*', '', item_name)
-            item_name = re.sub(r'^(г|гр|кг|мл|ml|l|лажица|лажици|чаша|канче|пола|малку|малу)\s+', '', item_name, flags=re.IGNORECASE)
-            item_name = item_name.strip()
-            if len(item_name) < 2:
-                item_name = ing
-            
-            item_id = find_or_create_item(item_name)
-            if item_id:
-                cursor.execute("""
-                    INSERT OR IGNORE INTO recipe_items (recipe_id, item_id, description, created_at, updated_at, optional)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (recipe_id, item_id, ing, now, now, 0))
-        
-        conn.commit()
+        for item_name, ing in items:
+            self.db.add_recipe_item(recipe_id, item_name, ing, now)
+
         print(f"  ✅ {recipe['name']} ({len(recipe['ingredients'])} ingredients)")
-        imported += 1
-    
-    conn.close()
-    
+
+    def close(self):
+        print(f"\n{'='*50}")
+        if self.plan_only:
+            self.db.close()
+            print(f"IMPORT PLAN (nothing written)")
+            print(f"  {self.plan.summary()}")
+            print('='*50)
+            return
+        print(f"IMPORT COMPLETE")
+        self.db.close()
+        print(f"  Plan: {self.plan.summary()}")
+        print(f"  Imported: {self.db.committed}")
+        print(f"  Skipped: {self.skipped}")
+        print('='*50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', type=Path, help='.docx files or folders containing them')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--dry-run', action='store_true', help='parse only, write /tmp/parsed_recipes.json')
+    mode.add_argument('--plan', action='store_true',
+                      help='show what would be inserted, updated or skipped; write nothing')
+    parser.add_argument('--update', action='store_true', help='replace recipes that already exist')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH,
+                        help=f'recipes per database transaction (default {DEFAULT_BATCH}, 1 = commit each recipe)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='documents parsed in parallel (default 1, 0 = one per CPU core)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'parse every document again instead of reusing {CACHE_DIR}')
+    args = parser.parse_args()
+
+    jobs = args.jobs or os.cpu_count() or 1
+
+    # Find Word documents
+    doc_files = []
+    for input_path in args.paths:
+        if not input_path.exists():
+            print(f"ERROR: Path does not exist: {input_path}")
+            sys.exit(1)
+        if input_path.is_file():
+            doc_files.append(input_path)
+        else:
+            doc_files.extend(sorted(list(input_path.glob("*.docx")) + list(input_path.glob("*.doc"))))
+
+    if not doc_files:
+        print(f"ERROR: No Word documents found in {', '.join(map(str, args.paths))}")
+        sys.exit(1)
+
+    print(f"Found {len(doc_files)} Word document(s)" + (f", parsing with {jobs} jobs" if jobs > 1 else ""))
+
+    # Recipes go to the JSON file or the database as they are parsed
+    sink = DryRunWriter() if args.dry_run else RecipeImporter(args.update, args.batch, args.plan)
+    cache = None if args.no_cache else ParseCache()
+    # Without the cache the parser writes images here; each is removed once its recipe is stored
+    staging_dir = tempfile.mkdtemp(prefix="kitchenowl-images-")
+    try:
+        import_documents(doc_files, jobs, staging_dir, sink, cache)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def import_documents(doc_files, jobs, staging_dir, sink, cache=None):
+    total = 0
+    failed = 0
+    import_failed = 0
+
+    for doc_file, recipes, output, error, cached in parse_documents(doc_files, jobs, staging_dir, cache):
+        print(f"\n{'='*50}")
+        print(f"Processing: {doc_file.name}" + (" (unchanged, from cache)" if cached else ""))
+        print('='*50)
+        print(output, end='')
+
+        found = 0
+        try:
+            if error is not None:
+                raise error
+            for r in recipes:
+                print(f"    - {r['name']} ({r.get('meal_type', 'N/A')}, {len(r['ingredients'])} ing)")
+                found += 1
+                # Only the parser's errors abort the document; report import errors per recipe
+                try:
+                    sink.add(r)
+                except Exception as e:
+                    print(f"  ERROR: Could not import {r['name']}: {e}")
+                    import_failed += 1
+                finally:
+                    if r.get('image_data') and cache is None:
+                        with contextlib.suppress(OSError):
+                            os.remove(r['image_data']['path'])
+        except Exception as e:
+            print(f"  ERROR: Could not parse {doc_file.name}: {e}")
+            failed += 1
+
+        print(f"  Found {found} recipe(s)" if found else "  No recipes found")
+        total += found
+        # python-docx's document/part graph is cyclic; free it now, not at
+        # the next cyclic GC run, so memory holds one document at a time
+        recipes = None
+        gc.collect()
+
     print(f"\n{'='*50}")
-    print(f"IMPORT COMPLETE")
-    print(f"  Imported: {imported}")
-    print(f"  Skipped: {skipped}")
+    print(f"Total: {total} recipes parsed" + (f", {failed} document(s) failed" if failed else ""))
+    if import_failed:
+        print(f"Import failed for {import_failed} recipe(s), see the errors above")
+    if cache:
+        print(f"Parse cache: {cache.hits} hit(s), {cache.misses} miss(es) ({cache.root})")
     print('='*50)
+    sink.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,322 @@
+"""
+KitchenOwl database access shared by the recipe importers
+(import-recipes-to-kitchenowl.py and import_from_json.py).
+
+ImportDatabase groups the import into transactions of --batch recipes
+instead of committing every new tag, item and recipe on its own. Tags and
+items are looked up in memory (HouseholdNames) and the recipe_tags and
+recipe_items rows of a chunk, and the tags and items they create, are
+written with executemany. ImportPlan decides insert, update or skip for
+every recipe from one query, before anything is written.
+
+import_from_json.py runs inside the KitchenOwl container: copy this file
+next to it (docker cp kitchenowl_db.py kitchenowl:/data/).
+"""
+import collections
+import contextlib
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+DEFAULT_BATCH = 100
+
+
+def name_key(name):
+    """
+    How tag and item names are matched: case-insensitively for any script.
+    SQLite's LOWER() folds ASCII only, so "Јајца" and "јајца" used to become
+    two items.
+    """
+    return name.strip().casefold()
+
+
+def recipe_fingerprint(description, lines):
+    """A digest of what an import writes for a recipe: description and ingredient lines."""
+    digest = hashlib.sha1((description or '').encode())
+    for line in sorted(lines):
+        digest.update(b'\x1f' + line.encode())
+    return digest.hexdigest()
+
+
+def linked_lines(items):
+    """
+    The ingredient lines an import links, from (item name, line) pairs:
+    the first line per item, none for names under two characters.
+    """
+    lines = {}
+    for name, line in items:
+        if len(name.strip()) >= 2:
+            lines.setdefault(name_key(name), line)
+    return list(lines.values())
+
+
+class ImportPlan:
+    """
+    What an import will do with each recipe, decided against the
+    household's existing recipes, which are loaded (with fingerprints of
+    their description and ingredient lines) in one query:
+
+      insert     no recipe of that name yet
+      skip       it exists (without --update)
+      unchanged  it exists with the same content (with --update)
+      update     it exists and differs (with --update): replaced
+
+    A name seen earlier in the same run counts as existing.
+    """
+
+    INSERT, UPDATE, UNCHANGED, SKIP = 'insert', 'update', 'unchanged', 'skip'
+    MARKS = {INSERT: '+', UPDATE: '~', UNCHANGED: '=', SKIP: '-'}
+
+    def __init__(self, cursor, household_id, update_mode):
+        self.update_mode = update_mode
+        self.ids = {}            # recipe name -> id, kept current by the writer
+        self.fingerprints = {}
+        self.counts = collections.Counter()
+        cursor.execute("""
+            SELECT r.id, r.name, r.description,
+                (SELECT group_concat(ri.description, char(31)) FROM recipe_items ri WHERE ri.recipe_id = r.id)
+            FROM recipe r WHERE r.household_id = ?
+        """, (household_id,))
+        for recipe_id, name, description, lines in cursor:
+            self.ids[name] = recipe_id
+            self.fingerprints[name] = recipe_fingerprint(description, lines.split('\x1f') if lines else [])
+
+    def classify(self, name, fingerprint):
+        if name not in self.fingerprints:
+            action = self.INSERT
+        elif not self.update_mode:
+            action = self.SKIP
+        elif self.fingerprints[name] == fingerprint:
+            action = self.UNCHANGED
+        else:
+            action = self.UPDATE
+        self.fingerprints[name] = fingerprint
+        self.counts[action] += 1
+        return action
+
+    def show(self, action, name):
+        print(f"  {self.MARKS[action]} {action}: {name}")
+
+    def summary(self):
+        return ', '.join(f"{self.counts[action]} {action}" for action in self.MARKS)
+
+
+class HouseholdNames:
+    """
+    The tag or item names of one household, loaded once and matched by
+    name_key(). New names are collected and inserted together by
+    insert_new(); where the table already has case variants of a name, the
+    oldest row is used.
+    """
+
+    def __init__(self, cursor, table, household_id):
+        self.table = table
+        self.household_id = household_id
+        self.ids = {}
+        self.new = {}         # key -> name, not yet inserted
+        self._inserted = []   # keys inserted in the open transaction
+        cursor.execute(f"SELECT id, name FROM {table} WHERE household_id = ? ORDER BY id", (household_id,))
+        for row_id, name in cursor:
+            self.ids.setdefault(name_key(name), row_id)
+
+    def key(self, name):
+        """The key for name, queued for insert_new() if the household lacks it."""
+        key = name_key(name)
+        if key not in self.ids and key not in self.new:
+            self.new[key] = name.strip()
+        return key
+
+    def insert_new(self, cursor, now):
+        if not self.new:
+            return
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.table}")
+        last_id = cursor.fetchone()[0]
+        cursor.executemany(
+            f"INSERT INTO {self.table} (name, household_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            [(name, self.household_id, now, now) for name in self.new.values()])
+        cursor.execute(f"SELECT id, name FROM {self.table} WHERE household_id = ? AND id > ? ORDER BY id",
+                       (self.household_id, last_id))
+        for row_id, name in cursor.fetchall():
+            key = name_key(name)
+            if key in self.new:
+                self.ids[key] = row_id
+                self._inserted.append(key)
+        self.new.clear()
+
+    def commit(self):
+        self._inserted.clear()
+
+    def rollback(self):
+        for key in self._inserted:
+            self.ids.pop(key, None)
+        self._inserted.clear()
+        self.new.clear()
+
+
+class ImportDatabase:
+    """
+    A KitchenOwl SQLite database opened for a bulk import.
+
+    While it is open the database runs with journal_mode=WAL and
+    synchronous=NORMAL: a commit no longer waits for fsync, and a crash can
+    lose at most the last chunks, never corrupt the file. The previous
+    journal mode is restored on close().
+
+    Recipes are committed in chunks of `batch`. If anything in a chunk
+    fails, the whole chunk is rolled back (and the photos it copied are
+    deleted), so a chunk is either fully imported or not at all.
+    """
+
+    def __init__(self, path, batch=DEFAULT_BATCH, read_only=False):
+        self.read_only = read_only
+        if read_only:
+            # --plan: nothing is written, not even the journal mode
+            self.conn = sqlite3.connect(Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+        else:
+            self.conn = sqlite3.connect(path)
+        self.cursor = self.conn.cursor()
+        self.batch = max(1, batch)
+        if not read_only:
+            self.journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        self.committed = 0
+        self.rolled_back = 0
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self._chunk = []    # names of the recipes in the open transaction
+        self._files = []    # files written for them, removed on rollback
+        self.tags = self.items = None
+        self._tag_rows = []    # (recipe_id, tag key, now)
+        self._item_rows = []   # (recipe_id, item key, description, now)
+
+    def load_names(self, household_id):
+        """Load the household's tags and items; needed before adding recipe rows."""
+        self.tags = HouseholdNames(self.cursor, 'tag', household_id)
+        self.items = HouseholdNames(self.cursor, 'item', household_id)
+
+    def add_recipe_tag(self, recipe_id, name, now):
+        """Link a recipe to the tag called name (created if new)."""
+        self._tag_rows.append((recipe_id, self.tags.key(name), now))
+
+    def add_recipe_item(self, recipe_id, name, description, now):
+        """
+        Link a recipe to the item called name (created if new). Returns the
+        item's key, or None for names under two characters, which are skipped.
+        """
+        if len(name.strip()) < 2:
+            return None
+        key = self.items.key(name)
+        self._item_rows.append((recipe_id, key, description, now))
+        return key
+
+    def delete_recipe(self, recipe_id):
+        """Remove a recipe and its tag and item links (to write a new version)."""
+        self.flush_rows()  # rows buffered for this id must not outlive it
+        self.cursor.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+        self.cursor.execute("DELETE FROM recipe_items WHERE recipe_id = ?", (recipe_id,))
+        self.cursor.execute("DELETE FROM recipe WHERE id = ?", (recipe_id,))
+
+    def add_file(self, path):
+        """A file that belongs to the open chunk (deleted if it is rolled back)."""
+        self._files.append(path)
+
+    def flush_rows(self):
+        """
+        Insert the new tags and items, then the buffered recipe_tags and
+        recipe_items rows (in the open transaction).
+        """
+        if self._tag_rows:
+            self.tags.insert_new(self.cursor, self._tag_rows[0][2])
+            ids = self.tags.ids
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO recipe_tags (recipe_id, tag_id, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(recipe_id, ids[key], now, now) for recipe_id, key, now in self._tag_rows])
+            self._tag_rows.clear()
+        if self._item_rows:
+            self.items.insert_new(self.cursor, self._item_rows[0][3])
+            ids = self.items.ids
+            self.cursor.executemany("""
+                INSERT OR IGNORE INTO recipe_items (recipe_id, item_id, description, created_at, updated_at, optional)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(recipe_id, ids[key], description, now, now, 0)
+                  for recipe_id, key, description, now in self._item_rows])
+            self._item_rows.clear()
+
+    def recipe_done(self, name):
+        """Count a written recipe; commits once the chunk is full."""
+        self._chunk.append(name)
+        if len(self._chunk) >= self.batch:
+            self.commit()
+
+    def commit(self):
+        if not self._chunk:
+            return
+        try:
+            self.flush_rows()
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.rollback(e)
+            return
+        self.committed += len(self._chunk)
+        self.chunks += 1
+        self._chunk.clear()
+        self._files.clear()
+        for names in (self.tags, self.items):
+            if names is not None:
+                names.commit()
+
+    def rollback(self, error):
+        """Undo the open chunk after `error`."""
+        self.conn.rollback()
+        for path in self._files:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+        print(f"  ↩️  Rolled back {len(self._chunk)} recipe(s) after: {error}")
+        for name in self._chunk:
+            print(f"     - {name}")
+        self.rolled_back += len(self._chunk)
+        self._chunk.clear()
+        self._files.clear()
+        self._tag_rows.clear()
+        self._item_rows.clear()
+        for names in (self.tags, self.items):
+            if names is not None:
+                names.rollback()
+
+    @contextlib.contextmanager
+    def recipe(self, name):
+        """
+        Write one recipe: commits with its chunk when the block succeeds;
+        if the block raises, the open chunk (this recipe included) is rolled back.
+        """
+        try:
+            yield
+        except Exception as e:
+            self._chunk.append(name)
+            self.rollback(e)
+            return
+        self.recipe_done(name)
+
+    def close(self):
+        """Commit the last chunk, restore the journal mode and print the rate."""
+        if self.read_only:
+            self.conn.close()
+            return
+        self.commit()
+        if self.journal_mode.lower() != 'wal':
+            try:
+                self.conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            except sqlite3.Error as e:
+                print(f"  ⚠️  Could not restore journal_mode={self.journal_mode}: {e}")
+        self.conn.close()
+        elapsed = time.perf_counter() - self.started
+        rate = self.committed / elapsed if elapsed > 0 else 0
+        print(f"  Committed {self.committed} recipe(s) in {self.chunks} transaction(s) "
+              f"of up to {self.batch}: {elapsed:.1f}s, {rate:.1f} recipes/s")
+        if self.rolled_back:
+            print(f"  Rolled back: {self.rolled_back}")
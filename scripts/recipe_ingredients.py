@@ -0,0 +1,146 @@
+"""
+Recipe line classification and ingredient parsing shared by the KitchenOwl
+recipe importers (import-recipes-to-kitchenowl.py and import_from_json.py).
+
+    >>> classify_line("Измешајте ги сите состојки во сад.")
+    'instruction'
+    >>> parse_ingredient("2 јајца")
+    Ingredient(quantity='2', unit=None, item='јајца')
+    >>> parse_ingredient("1–2 лажици мед")
+    Ingredient(quantity='1–2', unit='лажици', item='мед')
+
+The item name is what the importers look up (or create) in KitchenOwl's
+item table. Meal plans repeat the same lines hundreds of times, so both
+functions are memoized in an LRU cache.
+
+import_from_json.py runs inside the KitchenOwl container: copy this file
+next to it (docker cp recipe_ingredients.py kitchenowl:/data/).
+"""
+import functools
+import re
+from collections import namedtuple
+
+# Leading amount: digits, separators and fractions ("200", "0,5", "1/2"),
+# optionally a range ("1-2", "1–2", "1 – 2")
+QUANTITY_PATTERN = re.compile(r'^[\d\s.,\-/]+(?:–\s*[\d.,/]+\s*)?')
+UNIT_PATTERN = re.compile(r'^(г|гр|кг|мл|ml|l|лажица|лажици|чаша|канче|пола|малку|малу)\s+', re.IGNORECASE)
+
+Ingredient = namedtuple('Ingredient', 'quantity unit item')
+
+# Line kinds returned by classify_line()
+INGREDIENT = 'ingredient'
+PREP_STEP = 'prep step'              # mentions a preparation step or time
+INSTRUCTION = 'instruction'          # numbered step, instruction verb or long line
+CALORIES = 'calories'                # "Калории: 350kcal | ..." (and Калории ВЕГЕ)
+SECTION_HEADER = 'section header'    # short "label:" line, e.g. "За сосот:"
+INGREDIENTS_HEADER = 'ingredients header'
+INSTRUCTIONS_HEADER = 'instructions header'
+CALORIES_HEADER = 'calories header'
+# The recipe section each header opens
+HEADER_SECTIONS = {
+    INGREDIENTS_HEADER: 'ingredients',
+    INSTRUCTIONS_HEADER: 'instructions',
+    CALORIES_HEADER: 'calories',
+}
+
+BULLETS = ('–', '-', '*', '•')
+INSTRUCTION_VERBS = ('печете', 'ставете', 'измешајте', 'додадете', 'пржете', 'варете', 'сварете',
+                     'исецкајте', 'изблендирајте', 'подгответе', 'сервирајте')
+# A measure means an ingredient line, even if it starts like an instruction
+MEASURE_UNITS = ('гр', 'кг', 'лажици', 'лажица', 'мл', 'ml', 'kcal', 'калории')
+PREP_INDICATORS = ('измешајте', 'мешајте', 'ставете', 'додајте', 'наредете', 'поделете',
+                   'сервирајте', 'оставете', 'печете', 'варете', 'пржете', 'загрејте',
+                   'исечете', 'сечете', 'излупете', 'исчистете', 'измијте',
+                   'во сад', 'во тава', 'во чинија', 'во рерна', 'на оган',
+                   'подготовка', 'припрема', 'приготви', 'минути', 'часа', 'секунди')
+
+
+def _trie(words):
+    """
+    A regex alternation of words shaped as a prefix tree ("в(?:арете|о (?:рерна|сад))"),
+    so the regex engine branches on each character instead of retrying every
+    word at every position.
+    """
+    tree = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node):
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        optional = '' in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if optional else '')
+
+    return render(tree)
+
+
+# All patterns run on the lower-cased line. What a line starts with decides
+# most kinds in one anchored match; units and prep indicators are then
+# searched for only when the kind depends on them.
+START_PATTERN = re.compile('|'.join((
+    r'(?P<ingredients_header>состојки|ингредиенти|ingredients)',
+    r'(?P<instructions_header>начин на припрема|приготовка|подготовка|instructions)',
+    r'(?P<calories_header>калориска вредност\s*$)',
+    r'(?P<calories>калории(?:\s+веге)?\s*:)',
+    r'(?P<numbered>\d+[.)]\s)',
+    r'(?P<verb>' + _trie(INSTRUCTION_VERBS) + ')',
+)))
+MEASURE_PATTERN = re.compile(r'\b' + _trie(MEASURE_UNITS) + r'\b')
+PREP_PATTERN = re.compile(_trie(PREP_INDICATORS))
+_START_KINDS = {
+    'ingredients_header': INGREDIENTS_HEADER,
+    'instructions_header': INSTRUCTIONS_HEADER,
+    'calories_header': CALORIES_HEADER,
+    'calories': CALORIES,
+}
+
+
+@functools.lru_cache(maxsize=8192)
+def classify_line(line):
+    """
+    The kind of a (stripped) recipe line, in order of precedence: a section
+    header, calorie values, INSTRUCTION, PREP_STEP, SECTION_HEADER or
+    INGREDIENT. Lines over 100 characters are never ingredients.
+    """
+    lower = line.lower()
+    start = START_PATTERN.match(lower)
+    if start and start.lastgroup in _START_KINDS:
+        return _START_KINDS[start.lastgroup]
+    long_line = len(line) > 100
+    if (start or (long_line and not line.startswith(BULLETS))) and not MEASURE_PATTERN.search(lower):
+        return INSTRUCTION
+    if long_line or PREP_PATTERN.search(lower):
+        return PREP_STEP
+    if line.endswith(':') and len(line) < 50:
+        return SECTION_HEADER
+    return INGREDIENT
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_ingredient(text):
+    """
+    Split an ingredient line into Ingredient(quantity, unit, item).
+
+    quantity and unit are the text as written (None when absent). When
+    nothing usable is left after them, item is the whole line.
+    """
+    rest = text
+    quantity = unit = None
+    match = QUANTITY_PATTERN.match(rest)
+    if match:
+        quantity = match.group().strip(' .,-/') or None
+        rest = rest[match.end():]
+    match = UNIT_PATTERN.match(rest)
+    if match:
+        unit = match.group(1)
+        rest = rest[match.end():]
+    item = rest.strip()
+    if len(item) < 2:
+        item = text
+    return Ingredient(quantity, unit, item)